@@ -61,11 +61,18 @@ class Validator:
 
 # --- ModelInteraction Class ---
 class ModelInteraction:
-    @staticmethod
-    def generate_model_response(system, prompt, required_fields=None):
+    client = ollama.Client()
+
+    @classmethod
+    def use_host(cls, host):
+        """Sends the evaluation calls to another server (e.g. the agents' stub server)."""
+        cls.client = ollama.Client(host=host)
+
+    @classmethod
+    def generate_model_response(cls, system, prompt, required_fields=None):
         if required_fields is None:
             required_fields = []
-        response = ollama.generate(
+        response = cls.client.generate(
             model='llama3:8b',
             system=system.strip(),
             prompt=prompt.strip(),
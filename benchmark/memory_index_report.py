@@ -0,0 +1,79 @@
+# memory_index_report.py
+
+import json
+import sys
+import time
+
+import numpy as np
+
+from modules.memory_index import IVFIndex
+
+
+def make_collection(size, dimension=384, n_topics=200, seed=0):
+    """Synthetic normalised embeddings, clustered around `n_topics` directions like real memories."""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dimension)).astype(np.float32)
+    embeddings = topics[rng.integers(0, n_topics, size)] + 0.5 * rng.standard_normal((size, dimension)).astype(
+        np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def exact_top_k(embeddings, query, k):
+    similarities = embeddings @ query
+    best = np.argpartition(-similarities, k - 1)[:k]
+    return best[np.argsort(-similarities[best])]
+
+
+def ivf_top_k(index, embeddings, query, k):
+    candidates = index.candidates(query, embeddings, len(embeddings))
+    similarities = embeddings[candidates] @ query
+    if len(candidates) > k:
+        best = np.argpartition(-similarities, k - 1)[:k]
+        candidates, similarities = candidates[best], similarities[best]
+    return candidates[np.argsort(-similarities)]
+
+
+def run_index_report(sizes=(1_000, 10_000, 50_000), n_queries=200, k=5, n_probes=(4, 8, 16)):
+    """
+    Compares exact search with the IVF index: recall@k against the exact results and mean latency per query.
+    """
+    report = []
+    for size in sizes:
+        embeddings = make_collection(size)
+        queries = make_collection(n_queries, seed=1)
+
+        start = time.perf_counter()
+        expected = [exact_top_k(embeddings, query, k) for query in queries]
+        exact_latency = (time.perf_counter() - start) / n_queries
+
+        for n_probe in n_probes:
+            index = IVFIndex(size, n_probe=n_probe, min_size=0)
+
+            start = time.perf_counter()
+            index.train(embeddings, size)
+            training_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            found = [ivf_top_k(index, embeddings, query, k) for query in queries]
+            ivf_latency = (time.perf_counter() - start) / n_queries
+
+            recall = np.mean([len(np.intersect1d(a, b)) / k for a, b in zip(expected, found)])
+            report.append({
+                'size': size,
+                'n_probe': n_probe,
+                'recall_at_k': float(recall),
+                'exact_latency_ms': exact_latency * 1000,
+                'ivf_latency_ms': ivf_latency * 1000,
+                'training_time_s': training_time
+            })
+            print(f"size={size:>7} n_probe={n_probe:>3} recall@{k}={recall:.3f} "
+                  f"exact={exact_latency * 1000:.3f}ms ivf={ivf_latency * 1000:.3f}ms train={training_time:.2f}s")
+
+    return report
+
+
+if __name__ == "__main__":
+    results = run_index_report()
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'w') as f:
+            json.dump(results, f, indent=4)
@@ -0,0 +1,231 @@
+# memory_store_benchmark.py
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+from modules.agent_memories import Memories
+from utils.embedding_models import acquire_model, register_model, release_model, DEFAULT_EMBEDDING_MODEL
+
+STUB_MODEL_NAME = 'stub-encoder'
+DEFAULT_SIZES = (100, 1_000, 10_000, 100_000)
+DEFAULT_QUERY_COUNTS = (1, 4, 16)
+DOC_TYPES = ('MEMORY', 'PLAN')
+
+
+class StubEncoder:
+    """
+    Deterministic encoder returning a pseudo-random unit vector per text (seeded by its hash), so the benchmark
+    measures the memory store alone, without the SentenceTransformer cost.
+    """
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, sentences, show_progress_bar=False, convert_to_numpy=True):
+        texts = [sentences] if isinstance(sentences, str) else list(sentences)
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+            embeddings[i] = np.random.default_rng(seed).standard_normal(self.dimension)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings[0] if isinstance(sentences, str) else embeddings
+
+
+def make_documents(count, seed=0, offset=0):
+    """Synthetic reflections/plans with a realistic length (about 40 words)."""
+    rng = np.random.default_rng(seed)
+    words = [f'word{i}' for i in range(2_000)]
+    return [f"Document {offset + i}: " + ' '.join(rng.choice(words, 40)) for i in range(count)]
+
+
+def _summary(operation, size, latencies, **fields):
+    """Latency statistics in milliseconds, rounded so reports diff cleanly across commits."""
+    latencies = np.asarray(latencies) * 1000
+    return {
+        'operation': operation,
+        'size': size,
+        **fields,
+        'runs': len(latencies),
+        'mean_ms': round(float(latencies.mean()), 4),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 4),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 4),
+    }
+
+
+def fill_collection(memory, size, batch_size=1_024):
+    """
+    Fills a collection with `size` synthetic documents, encoded in batches and written straight to the ring buffer,
+    then snapshots it (the prefill is not part of the measurements).
+    """
+    for start in range(0, size, batch_size):
+        documents = make_documents(min(batch_size, size - start), seed=start, offset=start)
+        embeddings = memory.model.encode(documents, show_progress_bar=False)
+        with memory._lock:
+            for i, (document, embedding) in enumerate(zip(documents, embeddings)):
+                memory._sequence += 1
+                memory._append(document + '\n', embedding,
+                               {"type": DOC_TYPES[(start + i) % len(DOC_TYPES)], "timestamp": float(start + i)})
+    memory._save_memory()
+
+
+def benchmark_size(size, folder, model_name, query_counts=DEFAULT_QUERY_COUNTS, repeats=20, inserts=100,
+                   n_results=5, **memory_options):
+    """
+    Measures add_document, query_multiple, _save_memory and _load_memory on a collection of `size` documents, and
+    `pickle.load` of the same collection in the legacy pickle layout as a reference.
+    """
+    results = []
+    collection_name = f'bench_{size}_mem.pkl'
+    memory = Memories(collection_name, base_folder=folder, model_name=model_name, max_documents=size,
+                      **memory_options)
+    try:
+        fill_collection(memory, size)
+
+        queries = make_documents(max(query_counts) * repeats, seed=size + 1)
+        # Warm-up, so the one-off approximate index training is not counted as query latency
+        memory.query_multiple(queries[:1], n_results=n_results)
+        for count in query_counts:
+            latencies = []
+            for i in range(repeats):
+                start = time.perf_counter()
+                memory.query_multiple(queries[i * count:(i + 1) * count], n_results=n_results)
+                latencies.append(time.perf_counter() - start)
+            results.append(_summary('query_multiple', size, latencies, queries=count))
+
+        latencies = []
+        for document in make_documents(inserts, seed=size + 2, offset=size):
+            start = time.perf_counter()
+            memory.add_document(document, 'MEMORY')
+            latencies.append(time.perf_counter() - start)
+        results.append(_summary('add_document', size, latencies))
+
+        latencies = []
+        for _ in range(max(1, repeats // 4)):
+            start = time.perf_counter()
+            with memory._lock:
+                memory._save_memory()
+            latencies.append(time.perf_counter() - start)
+        results.append(_summary('_save_memory', size, latencies))
+    finally:
+        memory.close()
+
+    # Loading is measured through the constructor, whose only disk work is `_load_memory`: the embedding model is
+    # already held by the registry, so acquiring it is a dictionary lookup.
+    latencies = []
+    for _ in range(max(1, repeats // 4)):
+        start = time.perf_counter()
+        memory = Memories(collection_name, base_folder=folder, model_name=model_name, max_documents=size,
+                          read_only=True, **memory_options)
+        latencies.append(time.perf_counter() - start)
+        memory.close()
+    results.append(_summary('_load_memory', size, latencies))
+
+    # Reference: `pickle.load` of the same collection in the legacy single-pickle layout
+    memory = Memories(collection_name, base_folder=folder, model_name=model_name, max_documents=size,
+                      read_only=True, **memory_options)
+    documents, embeddings, metadatas = memory.get_all_documents()
+    memory.close()
+    pickle_path = os.path.join(folder, f'bench_{size}_legacy.pkl')
+    with open(pickle_path, 'wb') as f:
+        pickle.dump({'documents': documents, 'embeddings': embeddings, 'metadatas': metadatas}, f)
+    latencies = []
+    for _ in range(max(1, repeats // 4)):
+        start = time.perf_counter()
+        with open(pickle_path, 'rb') as f:
+            pickle.load(f)
+        latencies.append(time.perf_counter() - start)
+    results.append(_summary('pickle_load', size, latencies))
+
+    for result in results:
+        queries = f" queries={result['queries']}" if 'queries' in result else ''
+        print(f"size={size:>7} {result['operation']:<15}{queries} mean={result['mean_ms']:.3f}ms "
+              f"p95={result['p95_ms']:.3f}ms")
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_memory_store_benchmark(sizes=DEFAULT_SIZES, query_counts=DEFAULT_QUERY_COUNTS, repeats=20, inserts=100,
+                               stub_encoder=True, precision='float32', index='ivf'):
+    """
+    Runs the memory store micro-benchmarks on synthetic collections of increasing size.
+
+    Args:
+        sizes (Iterable[int]): Collection sizes to benchmark.
+        query_counts (Iterable[int]): Number of queries per `query_multiple` call.
+        repeats (int): Number of measured query calls per query count.
+        inserts (int): Number of measured `add_document` calls.
+        stub_encoder (bool): Use `StubEncoder` instead of the SentenceTransformer, to exclude the encoder cost.
+        precision (str): Embedding precision of the collections.
+        index (str, optional): Approximate index of the collections, None for exact search only.
+
+    Returns:
+        dict: The report, with the benchmark settings under 'meta' and one entry per operation and size.
+    """
+    model_name = STUB_MODEL_NAME if stub_encoder else DEFAULT_EMBEDDING_MODEL
+    if stub_encoder:
+        register_model(model_name, StubEncoder())
+    else:
+        acquire_model(model_name)
+
+    folder = tempfile.mkdtemp(prefix='memory_bench_')
+    try:
+        results = []
+        for size in sizes:
+            results.extend(benchmark_size(size, folder, model_name, query_counts, repeats, inserts,
+                                          precision=precision, index=index))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+        release_model(model_name)
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'encoder': model_name,
+            'precision': precision,
+            'index': index,
+            'sizes': list(sizes),
+            'query_counts': list(query_counts),
+            'repeats': repeats,
+            'inserts': inserts,
+        },
+        'results': results
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memories micro-benchmarks")
+    parser.add_argument("--sizes", type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument("--query_counts", type=int, nargs='+', default=list(DEFAULT_QUERY_COUNTS))
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--inserts", type=int, default=100)
+    parser.add_argument("--real_encoder", action="store_true", help="Include the SentenceTransformer cost")
+    parser.add_argument("--precision", type=str, default='float32', choices=['float32', 'float16', 'int8'])
+    parser.add_argument("--no_index", action="store_true", help="Exact search only")
+    parser.add_argument("--output", type=str, help="Path of the JSON report")
+    args = parser.parse_args()
+
+    report = run_memory_store_benchmark(args.sizes, args.query_counts, args.repeats, args.inserts,
+                                        not args.real_encoder, args.precision, None if args.no_index else 'ivf')
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4, sort_keys=True)
@@ -0,0 +1,163 @@
+# prompt_cache_benchmark.py
+
+import argparse
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta
+
+from configs.ollama_options import AGENT_RESPONSE_OPTIONS, CONTEXTUALIZER_NEUTRAL_OPTIONS, QUERIES_OPTIONS
+from modules.agent_response_handler import Responder
+from modules.agent_summuries import Contextualizer
+from modules.llm_gateway import LLMGateway
+from modules.query_engine import QueryEngine
+from utils.agent.base_prompts import generate_agent_prompt, neutral_base, query_prompt_base
+from utils.file_utils import load_yaml
+
+USERS = ('Alice', 'Bob', 'Chloe', 'Dan')
+TOPICS = ('pineapple on pizza', 'the best Fast & Furious movie', 'a new GPU', 'weekend plans', 'a cat video')
+
+
+def make_round(round_index, rng):
+    """Volatile inputs of one agent cycle: a timestamped bot context, fresh messages, memories and a plan."""
+    now = datetime(2025, 1, 1, 12) + timedelta(minutes=round_index)
+    topic = rng.choice(TOPICS)
+    messages = [f"[{rng.choice(USERS)}] what do you think about {topic}? ({round_index}.{i})" for i in range(5)]
+    return {
+        'bot_context': f"Your name is Agent. It is {now:%Y-%m-%d %H:%M:%S}. You are currently on discord reading "
+                       f"the channel general",
+        'messages': messages,
+        'context': f"Reading the Discord conversation, I can observe that people are talking about {topic}.",
+        'memories': [f"I remember talking about {rng.choice(TOPICS)} with {rng.choice(USERS)}." for _ in range(3)],
+        'plan': f"I want to talk about {topic}."
+    }
+
+
+# Previous layouts: volatile sections (timestamp, plan, memories, context) before the static instructions
+def legacy_summurize_transcript(inputs):
+    msgs = '\n'.join(inputs['messages'])
+    system = f"""
+        {inputs['bot_context']}
+        """
+    prompt = f"""
+        {neutral_base}
+
+        The transcript to write about immediately:
+        {msgs}
+        """
+    return system, prompt, CONTEXTUALIZER_NEUTRAL_OPTIONS
+
+
+def legacy_create_response_queries(inputs, personality):
+    system = f"""
+Your personality is as follows:
+{personality}
+
+Your current plan is:
+{inputs['plan']}
+
+Here is the context from your notebook or diary:
+{inputs['context']}
+
+---
+
+{query_prompt_base}
+"""
+    return system, '\n'.join(inputs['messages']), QUERIES_OPTIONS
+
+
+def legacy_make_response(inputs, personality):
+    memories = '\n'.join(inputs['memories'])
+    system = f"""
+You are a Discord user with the following personality:
+{personality}
+
+What you were planning on doing:
+{inputs['plan']}
+
+What you can remember:
+{memories}
+
+----
+
+The last 5 messages your sent were:
+No previous message.
+
+{inputs['context']}
+
+Skip the greetings. You're reading the chat and responding as you feel.
+Reply immediately but don't repeat yourself or what is being said.
+Bring new beef to the table! Keep responses brief, like 1–2 sentences max, like a Discord message, unless maybe a longer answer is really needed.
+"""
+    return system, "\n" + '\n'.join(inputs['messages']), AGENT_RESPONSE_OPTIONS
+
+
+async def run_cycle(layout, llm, model, personality, inputs):
+    """Runs the LLM calls of one response cycle (context, queries, response) with the given prompt layout."""
+    if layout == 'legacy':
+        for task, (system, prompt, options) in (
+                ('summurize_transcript', legacy_summurize_transcript(inputs)),
+                ('create_response_queries', legacy_create_response_queries(inputs, personality)),
+                ('make_response', legacy_make_response(inputs, personality))):
+            await llm.generate(f'{task}:legacy', model=model, prompt=prompt, system=system, options=options)
+        return
+
+    await Contextualizer(model, llm).summurize_transcript(inputs['messages'], inputs['bot_context'])
+    await QueryEngine(model, llm).create_response_queries(inputs['plan'], inputs['context'], personality,
+                                                          inputs['messages'])
+    await Responder(model, llm).make_response(inputs['plan'], inputs['context'], inputs['memories'],
+                                              inputs['messages'], personality)
+
+
+async def run_prompt_cache_benchmark(model='llama3:8b', archetype='nerd', rounds=10, host=None, seed=0):
+    """
+    Measures the prompt-eval cost per call of the previous prompt layout and of the static-prefix layout.
+    The server only evaluates the prompt tokens missing from its KV cache, so reused prefixes show as fewer evaluated
+    tokens and a shorter prompt-eval time.
+
+    Args:
+        model (str): The model to benchmark.
+        archetype (str): Archetype of the personality prompt.
+        rounds (int): Number of response cycles per layout.
+        host (str, optional): Ollama server URL.
+        seed (int): Seed of the synthetic conversations.
+
+    Returns:
+        dict: Per layout and task, the mean prompt tokens evaluated and prompt-eval seconds per call.
+    """
+    personality = generate_agent_prompt(archetype, load_yaml('configs/archetypes.yaml')['agent_archetypes'][archetype])
+    report = {'meta': {'model': model, 'archetype': archetype, 'rounds': rounds}}
+
+    for layout in ('legacy', 'prefix'):
+        llm = LLMGateway(host)
+        await llm.preload(model)
+        rng = random.Random(seed)
+        for round_index in range(rounds):
+            await run_cycle(layout, llm, model, personality, make_round(round_index, rng))
+
+        report[layout] = {task.removesuffix(':legacy'): {
+            'mean_prompt_tokens': round(usage['mean_prompt_tokens'], 1),
+            'mean_prompt_eval_ms': round(usage['mean_prompt_eval_seconds'] * 1000, 2)
+        } for task, usage in llm.usage().items()}
+        await llm.aclose()
+
+    for task in report['prefix']:
+        legacy, prefix = report['legacy'][task], report['prefix'][task]
+        print(f"{task:<25} prompt tokens {legacy['mean_prompt_tokens']:>8} -> {prefix['mean_prompt_tokens']:>8}   "
+              f"prompt eval {legacy['mean_prompt_eval_ms']:>9.2f}ms -> {prefix['mean_prompt_eval_ms']:>9.2f}ms")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prompt-eval cost of the module prompt layouts (KV cache reuse)")
+    parser.add_argument("--model", type=str, default='llama3:8b')
+    parser.add_argument("--archetype", type=str, default='nerd')
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--host", type=str, help="Ollama server URL")
+    parser.add_argument("--output", type=str, help="Path of the JSON report")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_prompt_cache_benchmark(args.model, args.archetype, args.rounds, args.host))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4, sort_keys=True)
@@ -5,12 +5,14 @@ import subprocess
 import sys
 import warnings
 
+from benchmark.agent_prober import ModelInteraction
 from benchmark.quantitative_assessment_tasks import *
 from clients.prompt_client import PromptClient
 from modules.agent_memories import Memories
 from modules.agent_summuries import Contextualizer
 from utils.agent.agent_utils import *
 from utils.agent.base_prompts import generate_agent_prompt
+from utils.embedding_models import cache_stats, save_caches
 from utils.file_utils import load_agent_logs, save_benchmark_results, load_yaml
 
 warnings.filterwarnings("ignore", category=FutureWarning, module="huggingface_hub.file_download")
@@ -28,8 +30,9 @@ def load_qa_bench_data() -> dict[str, SimpleNamespace]:
         personnality_prompt: str = generate_agent_prompt(archetype,
                                                          load_yaml('configs/archetypes.yaml')['agent_archetypes'][
                                                              archetype])
-        agent_memories: Memories = \
-            Memories(f'qa_bench_{archetype}_mem.pkl', 'output/qa_bench/memories').get_all_documents()[0]
+        memory = Memories(f'qa_bench_{archetype}_mem.pkl', 'output/qa_bench/memories', read_only=True)
+        agent_memories: list[str] = memory.get_all_documents()[0]
+        memory.close()
         data: SimpleNamespace = load_agent_logs(f"output/qa_bench/logs/qa_bench_{archetype}_log.pkl")
 
         # Creates attributes such as logs.<archetype>.client 
@@ -67,12 +70,18 @@ async def run_benchmarks(archetype_logs: dict[str, SimpleNamespace]):
         # Models outputs
         'd1': {'description': 'Reflection Relevancy', 'archetypes': {}},
         'e1': {'description': 'Message Relevancy', 'archetypes': {}},
-        'f1': {'description': 'Plan Relevancy', 'archetypes': {}}
+        'f1': {'description': 'Plan Relevancy', 'archetypes': {}},
+
+        # Memory storage
+        'g1': {'description': 'Quantised Memory Recall (B1/B2 queries)', 'archetypes': {}}
     }
 
     for archetype, log in archetype_logs.items():
-        memory = Memories(f'qa_bench_{archetype}_mem.pkl', 'output/qa_bench/memories')
+        memory = Memories(f'qa_bench_{archetype}_mem.pkl', 'output/qa_bench/memories', read_only=True)
         client = log.client
+        # Evaluates with the Ollama server of the agents (the stub server when `llm_stub` is set)
+        if client.agent.llm.backend == 'ollama':
+            ModelInteraction.use_host(client.agent.llm.host)
 
         print('Working on', archetype)
 
@@ -98,8 +107,15 @@ async def run_benchmarks(archetype_logs: dict[str, SimpleNamespace]):
         benchmark_results['b2']['archetypes'][archetype] = run_b2(log.response_queries, memory)
         print('B2 DONE')
 
+        print('Starting G1')
+        benchmark_results['g1']['archetypes'][archetype] = run_g1(log.context_queries, log.response_queries,
+                                                                  f'qa_bench_{archetype}_mem.pkl',
+                                                                  'output/qa_bench/memories')
+        print('G1 DONE')
+
         print('Starting C1')
-        benchmark_results['c1']['archetypes'][archetype] = await run_c1(log.neutral_ctxs, Contextualizer('llama3:8b'))
+        benchmark_results['c1']['archetypes'][archetype] = await run_c1(log.neutral_ctxs,
+                                                                        Contextualizer('llama3:8b', client.agent.llm))
         print('C1 DONE')
 
         print('Starting D1')
@@ -115,10 +131,16 @@ async def run_benchmarks(archetype_logs: dict[str, SimpleNamespace]):
         print('F1 DONE')
 
         await client.stop()
+        memory.close()
 
         print(f'Saving results for {archetype}')
         save_benchmark_results(benchmark_results)
 
+    print('Embedding cache:', cache_stats())
+    # The task embedders stay loaded for the whole run, so their cache is persisted here rather than on release
+    save_caches()
+    llm = next(iter(archetype_logs.values())).client.agent.llm
+    print('LLM response cache:', llm.cache_stats())
     return benchmark_results
 
 
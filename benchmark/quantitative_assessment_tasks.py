@@ -40,6 +40,43 @@ def run_b2(logs, memory_module: Memories):
     }
 
 
+def _b1_b2_query_sets(context_queries, response_queries):
+    """Agent and baseline query lists issued by the B1 and B2 tasks."""
+    b1 = [queries for _, queries in context_queries] + [list(msgs) for msgs, _ in context_queries]
+    b2 = [queries for _, queries in response_queries] + [
+        [plan, context, personnality_prompt] + messages
+        for (plan, context, personnality_prompt, messages), _ in response_queries
+    ]
+    return {'b1': b1, 'b2': b2}
+
+
+def run_g1(context_queries, response_queries, collection_name, base_folder, precisions=('float16', 'int8')):
+    """
+    Measures the retrieval recall of quantised embedding storage on the B1/B2 queries, against float32 results.
+    """
+    query_sets = _b1_b2_query_sets(context_queries, response_queries)
+    reference = Memories(collection_name, base_folder, read_only=True)
+    expected = {task: [reference.query_batch(queries)[0] for queries in sets] for task, sets in query_sets.items()}
+    results = {'embedding_bytes': {'float32': reference._embeddings.nbytes}}
+    reference.close()
+
+    for precision in precisions:
+        memory = Memories(collection_name, base_folder, precision=precision, read_only=True)
+        results['embedding_bytes'][precision] = memory._embeddings.nbytes + memory._scales.nbytes
+
+        for task, sets in query_sets.items():
+            found, total = 0, 0
+            for queries, reference_results in zip(sets, expected[task]):
+                for result, reference_result in zip(memory.query_batch(queries)[0], reference_results):
+                    found += len(set(result) & set(reference_result))
+                    total += len(reference_result)
+            results.setdefault(task, {})[precision] = found / total if total else 1.0
+
+        memory.close()
+
+    return results
+
+
 async def run_c1(neutral_ctxs, contextualizer: Contextualizer):
     shared_keywords, unique_keywords = [], []
     cosine_similarities_baselines = []
@@ -50,6 +50,17 @@ def run(agent_conf):
 
             agent.responses.task_done()
 
+    async def typing_handler(channel_id):
+        """
+        Shows the typing indicator in a channel while the agent streams its response.
+        The indicator lasts until the message is sent (or 10 seconds).
+        """
+        try:
+            await bot.rest.trigger_typing(channel_id)
+            logger.debug(f"Agent-Client: [key=Discord] | Typing indicator started in channel {channel_id}")
+        except hikari.HikariError as e:
+            logger.warning(f"Agent-Client: [key=Discord] | Unable to trigger typing in channel {channel_id}: {e}")
+
     @bot.listen(hikari.GuildMessageCreateEvent)
     async def on_message(event: hikari.GuildMessageCreateEvent):
         logger.debug(
@@ -77,8 +88,7 @@ def run(agent_conf):
     @bot.listen(hikari.StoppingEvent)
     async def on_stopping(event: hikari.StoppingEvent) -> None:
         logger.info("Agent-Client: [key=Discord] | Bot is shutting down...")
-        agent.stop()
-
+        # Routines are stopped before the agent closes its memory, so none of them is left writing to it
         for task in tasks:
             task.cancel()
             logger.info(f"Agent-Client: [key=Discord] | Cancelled task: {task}")
@@ -88,6 +98,7 @@ def run(agent_conf):
                 await task
             except asyncio.CancelledError:
                 logger.warning("Agent-Client: [key=Discord] | Unable to cancel task cleanly.")
+        agent.stop()
 
     @bot.listen(hikari.GuildChannelCreateEvent)
     async def on_channel_create(event: hikari.GuildChannelCreateEvent) -> None:
@@ -130,6 +141,7 @@ def run(agent_conf):
 
         # Creating Agent
         agent = ag.Agent(uid, agent_conf, server, os.getenv("ARCHETYPE"))
+        agent.typing_listener = typing_handler
         logger.info(f"Agent-Client: [key=Discord] | Created Agent")
 
         # Starting message_handler() ready to consume messages from agent
@@ -35,9 +35,11 @@ class PromptClient:
 
     async def stop(self):
         logger.info(f"Agent-Client: [key=PromptClient] | [{self.name}] Stopping agent and cancelling tasks.")
-        self.agent.stop()
+        # Routines are stopped before the agent closes its memory, so none of them is left writing to it
         for task in self.tasks:
             task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.agent.stop()
 
     async def prompt(self, message, user_id, username, channel_id=1):
         logger.info(f"Agent-Client: [key=PromptClient] | [{self.name}] Prompting with message: '{message}'")
@@ -3,7 +3,7 @@
 BASE_OPTIONS = {
     "mirostat": 2,
     "mirostat_eta": 0.1,
-    "num_ctx": 8192,
+    "num_ctx": 4096,  # Module prompts are fitted to PROMPT_BUDGETS, which must fit in it with num_predict
 }
 
 PENALTY_PROFILE_STRONG = {
@@ -69,3 +69,77 @@ QUERIES_OPTIONS = {
     "num_predict": 300,
     "stop": ["<|endoftext|>"]
 }
+
+# ----- GATEWAY SETTINGS ------
+
+DEFAULT_LLM_BACKEND = "ollama"  # Server API: 'ollama' or 'openai' (OpenAI-compatible server, e.g. llama.cpp or vLLM)
+
+MAX_CONNECTIONS = 16  # Pooled HTTP connections to the Ollama server, shared by every agent of the process
+KEEPALIVE_EXPIRY = 300  # Seconds an idle connection stays open
+CONNECT_TIMEOUT = 10  # Seconds to establish a connection
+# How long the server keeps the model (and the KV cache of the last prompts) loaded after a request.
+# Must outlast the longest idle gap between agent requests, or every static prompt prefix is evaluated again.
+KEEP_ALIVE = "30m"
+
+# Generation timeouts (seconds), per module method
+DEFAULT_GENERATION_TIMEOUT = 120
+GENERATION_TIMEOUTS = {
+    "make_response": 60,
+    "new_discussion": 120,
+    "make_plan": 120,
+    "summurize_transcript": 120,
+    "summurize_into_memory": 120,
+    "create_transcript_queries": 120,
+    "create_response_queries": 120,
+}
+
+# ----- SCHEDULING ------
+
+MAX_CONCURRENT_REQUESTS = 2  # LLM requests sent at once by the process (match OLLAMA_NUM_PARALLEL / server slots)
+RESERVED_HIGH_PRIORITY_SLOTS = 1  # Slots kept free for user-facing responses
+
+# Priority class ('high', 'medium' or 'low') of each module method
+TASK_PRIORITIES = {
+    "make_response": "high",
+    "summurize_transcript": "medium",
+    "create_transcript_queries": "medium",
+    "create_response_queries": "medium",
+    "summurize_into_memory": "low",
+    "make_plan": "low",
+    "new_discussion": "low",
+}
+
+# ----- RESPONSE CACHE ------
+
+# Module of each module method, used by the per-module cache flags (`llm_cache` in the client configs)
+TASK_MODULES = {
+    "make_response": "responder",
+    "new_discussion": "responder",
+    "make_plan": "planner",
+    "summurize_transcript": "contextualizer",
+    "summurize_into_memory": "contextualizer",
+    "create_transcript_queries": "query_engine",
+    "create_response_queries": "query_engine",
+}
+LLM_CACHE_PATH = 'output/llm_cache/responses.db'
+LLM_CACHE_TTL = 30 * 24 * 3600  # Seconds a cached generation stays valid
+LLM_CACHE_MAX_ENTRIES = 100_000
+
+# ----- PROMPT BUDGETS ------
+
+# Token budget (estimated, ~4 characters per token) of each prompt section, per module method. Volatile sections are
+# trimmed to fit; 'system' (the static prefix reused from the KV cache) is never trimmed, only checked.
+# The budgets of a method plus its num_predict must fit in num_ctx.
+PROMPT_BUDGETS = {
+    "make_response": {
+        "system": 800, "plan": 150, "memories": 600, "last_messages": 200, "context": 400, "messages": 1200
+    },
+    "new_discussion": {"system": 700, "plan": 300},
+    "make_plan": {
+        "system": 1000, "channel_context": 400, "plan": 300, "memories": 600, "context": 400
+    },
+    "summurize_transcript": {"system": 200, "bot_context": 100, "transcript": 2500},
+    "summurize_into_memory": {"system": 900, "transcript": 2500},
+    "create_transcript_queries": {"system": 250, "transcript": 2500},
+    "create_response_queries": {"system": 900, "plan": 300, "context": 400, "messages": 1200},
+}
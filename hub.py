@@ -51,6 +51,27 @@ class ProbingConfig:
     archetype: str
 
 
+@dataclass
+class MigrateMemoriesConfig:
+    source: str
+    database: str
+
+
+@dataclass
+class ConvertMemoriesConfig:
+    source: str
+
+
+@dataclass
+class StubServerConfig:
+    host: str
+    port: int
+    latency: str
+    mean_latency: float
+    tokens_per_second: float
+    parallel: int
+
+
 # ---------- Command Handlers ----------
 def run_discord_bot(config: DiscordConfig):
     if config.env_path:
@@ -75,7 +96,7 @@ def run_discord_bot(config: DiscordConfig):
 
 async def run_simulation(config: SimConfig):
     print(f"Running simulation for {config.duration} seconds...")
-    await PromptClient.run_simulation(config.duration, True, CONSOLE_SIMULATION_CONFIG, 'Hi!')
+    await PromptClient.run_simulation(config.duration, config.verbose, CONSOLE_SIMULATION_CONFIG, 'Hi!')
 
 
 async def prepare_qa_bench(config: BenchPrepConfig):
@@ -122,6 +143,37 @@ async def probe(config: ProbingConfig):
     await client.stop()
 
 
+def migrate_memories(config: MigrateMemoriesConfig):
+    from modules.memory_database import migrate_collections
+    print(f"Migrating memories from {config.source} to {config.database}...")
+
+    migrated = migrate_collections(config.source, config.database)
+    for collection, count in migrated.items():
+        print(f"{collection}: {count} documents")
+    print(f"Migrated {len(migrated)} collections. Set 'memory_database: {config.database}' in the client config to use it.")
+
+
+def convert_memories(config: ConvertMemoriesConfig):
+    from modules.memory_format import convert_collections, FORMAT_VERSION
+    print(f"Converting memories in {config.source} to format v{FORMAT_VERSION}...")
+
+    converted = convert_collections(config.source)
+    for collection in converted:
+        print(f"{collection}: converted")
+    print(f"Converted {len(converted)} collections.")
+
+
+def run_stub_server(config: StubServerConfig):
+    from modules.llm_stub_server import StubLLMServer
+    server = StubLLMServer(config.host, config.port, latency=config.latency, mean_latency=config.mean_latency,
+                           tokens_per_second=config.tokens_per_second, parallel=config.parallel)
+    print(f"Stub LLM server listening on {server.url} (set OLLAMA_HOST={server.url} to use it)...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
 # ---------- Main CLI ----------
 def main():
     parser = argparse.ArgumentParser(description="AgentHub CLI")
@@ -137,6 +189,7 @@ def main():
     # Simulation
     p_sim = subparsers.add_parser("simulate", help="Run console simulation")
     p_sim.add_argument("--duration", type=int, default=3600)
+    p_sim.add_argument("--verbose", action="store_true")
 
     # QA Benchmark Prep
     p_prep = subparsers.add_parser("prep_qa", help="Prepare QA benchmark data")
@@ -155,6 +208,25 @@ def main():
     # Start Prompt Bench Benchmarking
     prompt_bench = subparsers.add_parser("promptbench", help="Run PromptBench benchmark")
 
+    # Memory migration
+    p_migrate = subparsers.add_parser("migrate_memories", help="Copy per-agent *_mem.pkl memories to a shared database")
+    p_migrate.add_argument("--source", type=str, default="output/memories", help="Folder holding the agent memories")
+    p_migrate.add_argument("--database", type=str, required=True, help="Path of the shared SQLite database")
+
+    # Memory format conversion
+    p_convert = subparsers.add_parser("convert_memories", help="Convert *_mem.pkl memories to the binary format")
+    p_convert.add_argument("--source", type=str, default="output/memories", help="Folder holding the agent memories")
+
+    # Stub LLM server
+    p_stub = subparsers.add_parser("stub_server", help="Serve a deterministic Ollama-compatible stub LLM")
+    p_stub.add_argument("--host", type=str, default="127.0.0.1")
+    p_stub.add_argument("--port", type=int, default=11435)
+    p_stub.add_argument("--latency", type=str, default="lognormal",
+                        choices=["constant", "uniform", "normal", "lognormal", "exponential"])
+    p_stub.add_argument("--mean_latency", type=float, default=0.05, help="Mean time to first token (seconds)")
+    p_stub.add_argument("--tokens_per_second", type=float, default=200)
+    p_stub.add_argument("--parallel", type=int, default=4, help="Requests generated at once")
+
     args = parser.parse_args()
 
     # Dispatch
@@ -186,6 +258,13 @@ def main():
             asyncio.run(probe(ProbingConfig(args.config, args.archetype)))
         case "promptbench":
             asyncio.run(run_prompt_bench())
+        case "migrate_memories":
+            migrate_memories(MigrateMemoriesConfig(args.source, args.database))
+        case "convert_memories":
+            convert_memories(ConvertMemoriesConfig(args.source))
+        case "stub_server":
+            run_stub_server(StubServerConfig(args.host, args.port, args.latency, args.mean_latency,
+                                             args.tokens_per_second, args.parallel))
 
 
 if __name__ == "__main__":
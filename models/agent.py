@@ -5,15 +5,20 @@ from collections import deque
 from datetime import datetime
 
 import modules.agent_memories as db
+from configs.ollama_options import DEFAULT_LLM_BACKEND
 from models.agent_logger import AgentLogger
 from models.discord_server import DiscordServer
 from models.event import Event
 from modules.agent_planner import Planner
 from modules.agent_response_handler import Responder
 from modules.agent_summuries import Contextualizer
+from modules.llm_gateway import shared_gateway
+from modules.llm_stub_server import start_stub_server
+from modules.memory_database import SharedMemories
 from modules.query_engine import QueryEngine
 from utils.agent.agent_utils import *
 from utils.agent.base_prompts import generate_agent_prompt
+from utils.embedding_models import configure_cache
 from utils.file_utils import load_yaml
 
 logging.getLogger("transformers").setLevel(logging.ERROR)
@@ -90,6 +95,8 @@ class Agent:
         self.persistance_id: str = f"{self.persistance_prefix}_{self.archetype}" if self.persistance_prefix else ""
         self.plan: str = self.config.base_plan or "Responding to every message."
         self.sequential: bool = self.config.sequential_mode
+        self.memory_token_budget: int | None = self.config.get('memory_token_budget')
+        self.stream_responses: bool = self.config.get('stream_responses', False)
         self.lock_response = False
 
         # creating necessary folders
@@ -111,6 +118,10 @@ class Agent:
         self.processed_messages: Queue = Queue()
         self.event_queue: Queue[Event] = Queue()
         self.last_messages: deque = deque(maxlen=5)
+        # Optional coroutine function, called with the channel id when a streamed response starts (typing indicator)
+        self.typing_listener = None
+        # Running typing listener tasks, referenced until done (the event loop only keeps weak references)
+        self._typing_tasks: set[asyncio.Task] = set()
         self.logger.logger.info(f"Agent-Info: [key={self.name}] | Queue created")
 
         # Agent State variable
@@ -122,19 +133,64 @@ class Agent:
         self.logger.logger.info(f"Agent-Info: [key={self.name}] | State variable loaded")
 
         # Agent Modules
-        self.responder = Responder(self.config.model)
-        self.query_engine = QueryEngine(self.config.model)
-        self.planner = Planner(self.config.model)
-        self.contextualizer = Contextualizer(self.config.model)
-        self.memory = db.Memories(collection_name=f'{self.persistance_id}_mem.pkl',
-                                  base_folder=self.config.persistance_path)
+        # One pooled LLM client shared by every module & agent of the process
+        # (served by the bundled stub server when `llm_stub` is set, for load tests without a model)
+        llm_host = start_stub_server(self.config.llm_stub) if self.config.get('llm_stub') else self.config.get('llm_host')
+        self.llm = shared_gateway(llm_host, self.config.get('llm_backend') or DEFAULT_LLM_BACKEND,
+                                  self.config.get('llm_parallel'))
+        if self.config.get('llm_cache') and self.config.get('llm_stub'):
+            # Canned stub generations must never be replayed by later runs against a real model
+            self.logger.logger.warning(f"Agent-Info: [key={self.name}] | llm_cache is ignored with llm_stub")
+        elif self.config.get('llm_cache'):
+            self.llm.enable_cache(self.config.llm_cache)
+        self.responder = Responder(self.config.model, self.llm)
+        self.query_engine = QueryEngine(self.config.model, self.llm)
+        self.planner = Planner(self.config.model, self.llm)
+        self.contextualizer = Contextualizer(self.config.model, self.llm)
+        if self.config.get('embedding_cache_folder'):
+            # Applies to the embedding model when it is first loaded, by the first agent of the process
+            configure_cache(cache_folder=self.config.embedding_cache_folder)
+        duplicates = {'duplicate_threshold': self.config.get('memory_duplicate_threshold'),
+                      'duplicate_policy': self.config.get('memory_duplicate_policy') or 'skip'}
+        if self.config.get('memory_database'):
+            unsupported = [key for key in ('memory_cold_storage', 'memory_write_batch') if self.config.get(key)]
+            if unsupported:
+                raise ValueError(f"{', '.join(unsupported)} not supported with memory_database, leave them empty")
+            self.memory = SharedMemories(collection_name=self.persistance_id,
+                                         database_path=self.config.memory_database, **duplicates)
+        else:
+            self.memory = db.Memories(collection_name=f'{self.persistance_id}_mem.pkl',
+                                      base_folder=self.config.persistance_path,
+                                      cold_storage=self.config.get('memory_cold_storage', False),
+                                      write_batch_size=self.config.get('memory_write_batch'), **duplicates)
         self.logger.logger.info(f"Agent-Info: [key={self.name}] | Module Loaded")
 
     # --- MISC ---
 
     def stop(self) -> None:
-        """Stops agent modules at next iteration"""
+        """
+        Stops agent modules at next iteration, closes the memory and releases the shared embedding model.
+        Routine tasks should be cancelled and awaited first; inserts still running on the executor are then dropped.
+        """
         self._running = False
+        self.memory.close()
+        self.logger.logger.info(f"Agent-Info: [key={self.name}] | LLM queue waits: {self.llm.stats()}")
+        self.logger.logger.info(f"Agent-Info: [key={self.name}] | LLM usage: {self.llm.usage()}")
+        if self.llm.cache is not None:
+            self.logger.logger.info(f"Agent-Info: [key={self.name}] | LLM cache: {self.llm.cache_stats()}")
+
+    def _start_typing(self, channel_id) -> None:
+        """Notifies the typing listener without delaying the response stream."""
+        if self.typing_listener is not None and channel_id is not None:
+            task = asyncio.create_task(self.typing_listener(channel_id))
+            self._typing_tasks.add(task)
+            task.add_done_callback(self._typing_done)
+
+    def _typing_done(self, task: asyncio.Task) -> None:
+        """Forgets a finished typing listener task, logging its error if it failed."""
+        self._typing_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.logger.warning(f"Agent-Info: [key={self.name}] | Typing listener failed: {task.exception()}")
 
     async def add_event(self, event: Event) -> None:
         """
@@ -182,17 +238,19 @@ class Agent:
         """
         queries = await self.query_engine.create_response_queries(plan, context, self.personnality_prompt, messages)
         self.logger.log_event('response_queries', (plan, context, self.personnality_prompt, messages), queries)
-        memories = self.memory.query_multiple(queries)
+        memories = await self.memory.aquery_merged(queries, max_tokens=self.memory_token_budget)
         self.logger.log_event('memories', queries, memories)
         return memories
 
-    async def get_response(self, plan, context, memories, messages, base_prompt) -> str:
+    async def get_response(self, plan, context, memories, messages, base_prompt, channel_id=None) -> str:
         """
         Generates a user response. 
         Combines current context, short-term memory, long-term memory, and personality info.
+        When streaming, the typing listener is notified for `channel_id` as soon as the first token arrives.
         """
         response = await self.responder.make_response(plan, context, memories, messages, base_prompt,
-                                                      self.last_messages)
+                                                      self.last_messages, stream=self.stream_responses,
+                                                      on_first_token=lambda: self._start_typing(channel_id))
         self.logger.log_event('response', (plan, context, memories, messages, base_prompt), response)
         self.last_messages.append(response)
         return response
@@ -231,6 +289,12 @@ class Agent:
         Main routine that controls agent response behavior. Operates in both sequential and non-sequential modes.
         """
 
+        # Loading the model up front, so the first response does not pay for it
+        try:
+            await self.llm.preload(self.config.model)
+        except Exception as e:
+            self.logger.logger.error(f"Agent-Routine: [key={self.name}] | Unable to preload {self.config.model}: {e}")
+
         while self._running:
 
             # If Empty Queue or Lock on response => Skip this iteration
@@ -295,7 +359,8 @@ class Agent:
 
         context = await self.get_channel_context(self.monitoring_channel, self.get_bot_context())
         memories = await self.get_memories(self.plan, context, formatted_messages)
-        response = await self.get_response(self.plan, context, memories, formatted_messages, self.personnality_prompt)
+        response = await self.get_response(self.plan, context, memories, formatted_messages, self.personnality_prompt,
+                                           events[0].channel_id)
 
         await self.responses.put((response, events[0].channel_id))
 
@@ -363,7 +428,7 @@ class Agent:
                 if self.memory_count % 6 == 0 and self.memory_count != 0:
                     context = await self.get_channel_context(self.monitoring_channel, self.get_bot_context())
                     neutral_queries = await self.get_neutral_queries(self.monitoring_channel)
-                    memories = self.memory.query_multiple(neutral_queries)
+                    memories = await self.memory.aquery_merged(neutral_queries, max_tokens=self.memory_token_budget)
                     channel_context = await self.get_channel_context(self.monitoring_channel, self.get_bot_context())
                     updated_plan = await self.get_plan(self.plan, context, memories, channel_context,
                                                        self.personnality_prompt)
@@ -371,7 +436,7 @@ class Agent:
 
                     if updated_plan:
                         self.memory_count += 1
-                        self.memory.add_document(updated_plan, 'PLAN')
+                        await self.memory.aadd_document(updated_plan, 'PLAN')
                         self.logger.logger.info(f"Agent-Routine: [key={self.name}] | Updated plan")
                 else:
                     self.logger.logger.info(f"Agent-Routine: [key={self.name}] | Not enough memories to change plan")
@@ -398,7 +463,7 @@ class Agent:
                     messages = [await self.processed_messages.get() for _ in range(5)]
                     if messages:
                         reflection = await self.get_reflection(messages, self.personnality_prompt)
-                        self.memory.add_document(reflection, 'MEMORY')
+                        await self.memory.aadd_document(reflection, 'MEMORY')
                         self.memory_count += 1
                         self.logger.logger.info(f"Agent-Routine: [key={self.name}] | Created memory")
                 else:
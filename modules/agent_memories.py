@@ -1,28 +1,96 @@
+import asyncio
+import logging
 import os
 import pickle
+import struct
+import threading
 import time
-from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
+
+from modules.memory_cold_store import ColdStore
+from modules.memory_format import map_embeddings, read_snapshot, write_snapshot
+from modules.memory_index import INDEXES
+from modules.memory_writer import acquire_writer, release_writer
+from utils.agent.agent_utils import fit_to_budget
+from utils.embedding_models import acquire_model, release_model, DEFAULT_EMBEDDING_MODEL
+
+logger = logging.getLogger(__name__)
+
+# Append-only log record: <payload length> followed by a pickled (sequence, document, embedding, metadata) tuple.
+# Near-duplicate merges add a fifth {'age': n} item: the replaced document is the n-th newest one (0 for the newest).
+_LOG_RECORD_HEADER = struct.Struct('<I')
+
+# Storage precisions of the embedding matrix. int8 rows are stored with one float32 scale per vector.
+PRECISIONS = {'float32': np.float32, 'float16': np.float16, 'int8': np.int8}
+# Rows dequantised at once when scoring a float16/int8 matrix, bounding the float32 temporaries
+_SCORE_BLOCK = 8192
+
+# Dedicated executor for the async API, so encoding and disk writes never run on the event loop
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='memories')
 
 
 class Memories:
     """
     A class for managing a collection of documents, storing embeddings, and querying the collection using semantic similarity.
 
+    Embeddings are kept L2-normalised in a preallocated float32 ring buffer, so cosine similarity reduces to a single
+    matrix-vector product and the oldest document is overwritten once `max_documents` is reached.
+
+    Persistence is incremental: every insert is appended to a log next to the collection file, and the log is compacted
+    into the collection snapshot every `compact_every` inserts (or when closing the collection).
+
+    The snapshot is a single `.mem` file in a versioned binary format (see `modules.memory_format`): its embeddings
+    block is opened with a copy-on-write `np.memmap`, so large stores open instantly and are paged in on demand, and
+    documents and metadata are stored as columns and length-prefixed UTF-8 strings. Legacy single-pickle collections
+    are still loaded and migrated at the next compaction.
+
+    Async routines should use `aadd_document`, `aquery_multiple` and `aquery_batch`, which run encoding and disk I/O on
+    a dedicated executor. Every read and write of the ring buffer happens under a lock, so a query always scores a
+    consistent snapshot even while the memory and plan routines insert concurrently.
+
+    Large collections can be searched through an approximate index (see `modules.memory_index`), persisted next to the
+    collection file. Candidates returned by the index are still scored exactly, and exact search is used as long as
+    the collection is smaller than the index `min_size`.
+
+    Embeddings can be stored as float16 or per-vector-scaled int8 (`precision`) to cut RAM and disk usage by 2x or 4x.
+    Quantised matrices are scored block by block, so the whole matrix is never dequantised at once.
+
+    Metadata is columnar (a document type code and a timestamp per slot), so queries can be pre-filtered on document
+    types or a time window with vectorised masks before any similarity is computed.
+
+    With `cold_storage`, the ring buffer becomes the hot tier of a two-tier store: evicted documents spill to an
+    append-only on-disk segment (see `modules.memory_cold_store`) instead of being forgotten. The cold tier is only
+    scanned for a query whose best hot similarity is below `cold_threshold`, and cold documents it returns are
+    promoted back to the hot tier, so recent and frequently retrieved documents stay in RAM.
+
+    With a `duplicate_threshold`, a new document whose cosine similarity to its nearest document of the same type
+    reaches the threshold is a near-duplicate: it is either dropped (`duplicate_policy='skip'`) or replaces the nearest
+    document in place (`'merge'`, keeping the newest wording and timestamp). `suppressed` counts both cases.
+
+    With a `write_batch_size`, `add_document` only queues the insert on the process-wide writer of the embedding model
+    (see `modules.memory_writer`), which embeds queued inserts together and flushes the log once per batch. Pending
+    inserts are written before any read, so queries always see the documents added before them.
+
     Attributes:
         collection_name (str): The name of the memory collection.
         base_folder (str): The base folder where memory files are stored.
         model_name (str): The name of the SentenceTransformer model used for embedding generation.
         max_documents (int): The maximum number of documents to store in memory.
-        _documents (deque): A deque storing the documents.
-        _embeddings (deque): A deque storing the embeddings of the documents.
-        _metadatas (deque): A deque storing metadata associated with the documents.
+        _documents (list): Ring buffer storing the documents.
+        _embeddings (np.ndarray): Ring buffer matrix (max_documents x dim) of normalised embeddings.
+        _scales (np.ndarray): Per-vector scales of the int8 ring buffer (ones for the other precisions).
+        _type_codes (np.ndarray): Ring buffer of document type codes, indexes of `_type_names` (-1 for empty slots).
+        _type_names (list): Document type names, in code order.
+        _timestamps (np.ndarray): Ring buffer of document timestamps, used for filtering and recency tie-breaking.
     """
 
-    def __init__(self, collection_name: str, base_folder: str = 'memories', model_name: str = 'all-MiniLM-L6-v2',
-                 max_documents: int = 500):
+    def __init__(self, collection_name: str, base_folder: str = 'memories', model_name: str = DEFAULT_EMBEDDING_MODEL,
+                 max_documents: int = 500, compact_every: int | None = None, index: str | None = 'ivf',
+                 precision: str = 'float32', read_only: bool = False, cold_storage: bool = False,
+                 cold_threshold: float = 0.35, duplicate_threshold: float | None = None,
+                 duplicate_policy: str = 'skip', write_batch_size: int | None = None, write_delay: float = 0.05):
         """
         Initializes the Memories class, setting up the necessary directories and loading previous data if available.
 
@@ -30,42 +98,411 @@ class Memories:
             collection_name (str): The name of the memory collection.
             base_folder (str): The base folder where memory files are stored (default is 'memories').
             model_name (str): The model name to use for SentenceTransformer (default is 'all-MiniLM-L6-v2').
+                The model is shared process-wide through `utils.embedding_models` and released by `close`.
             max_documents (int): The maximum number of documents to store in memory (default is 500).
+            compact_every (int, optional): Number of logged inserts before the log is compacted into the snapshot.
+                Defaults to `max_documents`, so the snapshot rewrite is amortised to O(1) per insert.
+            index (str, optional): Approximate index to use once the collection is large enough, one of
+                `modules.memory_index.INDEXES` (default is 'ivf'). None always uses exact search.
+            precision (str): Storage precision of the embeddings, one of `PRECISIONS` (default is 'float32').
+            read_only (bool): Never write to disk, useful to inspect a collection another process owns.
+            cold_storage (bool): Spill evicted documents to an on-disk cold tier instead of forgetting them.
+            cold_threshold (float): Best hot similarity under which the cold tier is searched (default is 0.35).
+            duplicate_threshold (float, optional): Cosine similarity from which a new document is a near-duplicate
+                of an existing document of the same type. No duplicate check if None.
+            duplicate_policy (str): What to do with near-duplicates, 'skip' or 'merge' (default is 'skip').
+            write_batch_size (int, optional): Coalesce inserts in batches of up to this size, written in the
+                background. Inserts are written synchronously if None.
+            write_delay (float): Maximum time, in seconds, a coalesced insert waits for its batch (default is 0.05).
         """
         os.makedirs(base_folder, exist_ok=True)
         self.file_path = os.path.join(base_folder, collection_name)
-        self.model = SentenceTransformer(model_name)
+        self.log_path = f'{self.file_path}.log'
+        store_prefix = os.path.splitext(self.file_path)[0]
+        self.snapshot_path = f'{store_prefix}.mem'
+        self.index_path = f'{store_prefix}.{index}.npz' if index else None
+        self.model_name = model_name
+        self.model = acquire_model(model_name)
+        self._closed = False
+        self.read_only = read_only
+        self.precision = precision
         self.max_documents = max_documents
-        self._documents = deque(maxlen=self.max_documents)
-        self._embeddings = deque(maxlen=self.max_documents)
-        self._metadatas = deque(maxlen=self.max_documents)
+        self.compact_every = compact_every or max_documents
+        self._dimension = self.model.get_sentence_embedding_dimension()
+        self._documents = [None] * self.max_documents
+        self._embeddings = np.zeros((self.max_documents, self._dimension), dtype=PRECISIONS[precision])
+        self._scales = np.ones(self.max_documents, dtype=np.float32)
+        self._type_codes = np.full(self.max_documents, -1, dtype=np.int16)
+        self._type_names = []
+        self._timestamps = np.zeros(self.max_documents, dtype=np.float64)
+        self._index = INDEXES[index](self.max_documents) if index else None
+        self.cold_threshold = cold_threshold
+        self._cold = ColdStore(store_prefix, self._dimension, read_only) if cold_storage else None
+        if duplicate_policy not in ('skip', 'merge'):
+            raise ValueError(f"Unknown duplicate policy '{duplicate_policy}', expected 'skip' or 'merge'")
+        self.duplicate_threshold = duplicate_threshold
+        self.duplicate_policy = duplicate_policy
+        self.suppressed = {'skipped': 0, 'merged': 0}
+        self._next_slot = 0
+        self._size = 0
+        self._sequence = 0
+        self._log_records = 0
+        self._log_file = None
+        # Set when the loaded snapshot was re-inserted into a ring of another layout (capacity or precision change)
+        self._relaid_out = False
+        self._lock = threading.RLock()
         self._load_memory()
+        self._writer = None
+        if write_batch_size and not read_only:
+            self._writer = acquire_writer(model_name, self.model, write_batch_size, write_delay)
+
+    def close(self):
+        """
+        Writes queued inserts, compacts pending log records, closes the log and releases the shared embedding model.
+        Safe to call more than once.
+        """
+        self._flush_writes()
+        with self._lock:
+            if self._closed:
+                return
+
+            self._closed = True
+            if any(self.suppressed.values()):
+                logger.info(f"Agent-Module: [key='Memories'] | {self.file_path}: near-duplicates skipped "
+                            f"{self.suppressed['skipped']}, merged {self.suppressed['merged']}")
+            if self._log_records and not self.read_only:
+                self._save_memory()
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+            if self._cold is not None:
+                self._cold.close()
+            writer, self._writer = self._writer, None
+
+        # Stopping the writer joins its thread, which may be waiting for the lock to insert (and drop) a late batch
+        if writer is not None:
+            release_writer(self.model_name)
+        release_model(self.model_name)
+
+    @staticmethod
+    def _normalize(embeddings):
+        """
+        L2-normalises one embedding or a matrix of embeddings (row-wise) as float32.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+    def _quantize(self, embedding):
+        """
+        Converts a normalised float32 embedding to the storage precision. Returns the stored row and its scale.
+        """
+        if self.precision != 'int8':
+            return embedding.astype(self._embeddings.dtype), 1.0
+
+        scale = max(float(np.abs(embedding).max()) / 127, 1e-12)
+        return np.round(embedding / scale).astype(np.int8), scale
+
+    def _dequantize(self, slots):
+        """
+        Returns the float32 embeddings stored in `slots`.
+        """
+        embeddings = self._embeddings[slots].astype(np.float32)
+        if self.precision == 'int8':
+            embeddings *= self._scales[slots, None]
+        return embeddings
+
+    def _scores(self, query_embeddings, slots=None):
+        """
+        Returns the (Q x N) cosine similarities between the queries and the documents in `slots` (all by default).
+        Quantised matrices are dequantised `_SCORE_BLOCK` rows at a time.
+        """
+        if slots is None:
+            slots = slice(0, self._size)
+            count = self._size
+        else:
+            count = len(slots)
+
+        if self.precision == 'float32':
+            return query_embeddings @ self._embeddings[slots].T
+
+        rows = np.arange(self._size)[slots] if isinstance(slots, slice) else slots
+        scores = np.empty((len(query_embeddings), count), dtype=np.float32)
+        for start in range(0, count, _SCORE_BLOCK):
+            block = rows[start:start + _SCORE_BLOCK]
+            scores[:, start:start + len(block)] = query_embeddings @ self._dequantize(block).T
+        return scores
+
+    def _type_code(self, doc_type):
+        """
+        Returns the code of a document type, registering the type on first use.
+        """
+        if doc_type not in self._type_names:
+            self._type_names.append(doc_type)
+        return self._type_names.index(doc_type)
+
+    def _metadata(self, slot):
+        """
+        Rebuilds the metadata dictionary of a slot from the metadata columns.
+        """
+        return {"type": self._type_names[self._type_codes[slot]], "timestamp": float(self._timestamps[slot])}
+
+    def _filter_mask(self, doc_types=None, since=None, until=None):
+        """
+        Returns a boolean mask over the occupied slots matching every given filter, or None when there is no filter.
+        """
+        if doc_types is None and since is None and until is None:
+            return None
+
+        mask = np.ones(self._size, dtype=bool)
+        if doc_types is not None:
+            codes = [self._type_names.index(doc_type) for doc_type in doc_types if doc_type in self._type_names]
+            mask &= np.isin(self._type_codes[:self._size], codes)
+        if since is not None:
+            mask &= self._timestamps[:self._size] >= since
+        if until is not None:
+            mask &= self._timestamps[:self._size] <= until
+        return mask
+
+    def _append(self, document, embedding, metadata):
+        """
+        Writes a document in the next ring buffer slot, evicting the oldest document once the buffer is full.
+        Evicted documents are spilled to the cold tier, if enabled.
+        """
+        slot = self._next_slot
+        embedding = self._normalize(embedding)
+        if self._cold is not None and self._size == self.max_documents:
+            self._cold.add(self._documents[slot], self._dequantize([slot])[0], int(self._type_codes[slot]),
+                           float(self._timestamps[slot]))
+
+        self._documents[slot] = document
+        self._embeddings[slot], self._scales[slot] = self._quantize(embedding)
+        self._type_codes[slot] = self._type_code(metadata.get('type'))
+        self._timestamps[slot] = metadata.get('timestamp', 0)
+        self._next_slot = (slot + 1) % self.max_documents
+        self._size = min(self._size + 1, self.max_documents)
+
+        if self._index is not None:
+            if self._size == self.max_documents:
+                self._index.remove(slot)
+            self._index.add(slot, embedding)
+
+    def _replace(self, slot, document, embedding, metadata):
+        """
+        Overwrites the document of an occupied slot in place (near-duplicate merge), without moving the ring.
+        """
+        embedding = self._normalize(embedding)
+        self._documents[slot] = document
+        self._embeddings[slot], self._scales[slot] = self._quantize(embedding)
+        self._type_codes[slot] = self._type_code(metadata.get('type'))
+        self._timestamps[slot] = metadata.get('timestamp', 0)
+
+        if self._index is not None:
+            self._index.remove(slot)
+            self._index.add(slot, embedding)
+
+    def _age(self, slot):
+        """
+        Returns the age of an occupied slot: 0 for the newest document, `_size - 1` for the oldest. Unlike the slot,
+        the age does not depend on the ring layout, so it survives a snapshot re-inserted at another capacity.
+        """
+        return (self._next_slot - 1 - slot) % self.max_documents
+
+    def _ordered_slots(self):
+        """
+        Returns the occupied ring buffer slots, from the oldest document to the newest.
+        """
+        return (np.arange(self._size) + self._next_slot - self._size) % self.max_documents
 
     def _load_memory(self):
         """
-        Loads the memory from a previously saved file, if available.
+        Loads the memory from a previously saved snapshot, if available, then replays the append-only log on top of it.
+
+        Log records already contained in the snapshot (crash between compaction and log truncation) are skipped, and
+        a torn record at the end of the log (crash mid-write) is discarded.
+        """
+        if os.path.exists(self.snapshot_path):
+            snapshot_sequence = self._load_snapshot(read_snapshot(self.snapshot_path))
+        elif os.path.exists(self.file_path):
+            snapshot_sequence = self._load_legacy_snapshot()
+        else:
+            snapshot_sequence = 0
+
+        self._sequence = snapshot_sequence
+        if self._index is not None:
+            self._load_index(snapshot_sequence)
+        self._replay_log(snapshot_sequence)
 
-        This method checks if the memory file exists and loads the documents, embeddings, and metadata.
+    def _load_snapshot(self, data):
+        """
+        Restores the ring buffer from a snapshot whose embeddings are a copy-on-write memmap. Returns the snapshot
+        sequence.
+
+        When the stored ring matches `max_documents`, the memmap becomes the ring buffer itself (zero copy). Otherwise
+        documents are re-inserted from the oldest to the newest so the current capacity is honoured.
+        """
+        embeddings = data['embeddings']
+        if embeddings.shape == self._embeddings.shape and embeddings.dtype == self._embeddings.dtype:
+            self._embeddings = embeddings
+            self._documents = data['documents']
+            self._type_codes = data['type_codes']
+            self._type_names = data['type_names']
+            self._timestamps = data['timestamps']
+            self._scales = data['scales']
+            self._next_slot = data['next_slot']
+            self._size = data['size']
+        else:
+            self._relaid_out = True
+            capacity, size, next_slot = len(embeddings), data['size'], data['next_slot']
+            scales = data['scales']
+            for slot in (np.arange(size) + next_slot - size) % capacity:
+                embedding = embeddings[slot].astype(np.float32) * scales[slot]
+                metadata = {"type": data['type_names'][data['type_codes'][slot]],
+                            "timestamp": data['timestamps'][slot]}
+                self._append(data['documents'][slot], embedding, metadata)
+
+        return data['sequence']
+
+    def _layout(self):
+        """
+        Returns the ring layout (next slot, precision, capacity) the slots of a persisted index refer to.
+        """
+        return self._next_slot, self.precision, self.max_documents
+
+    def _load_index(self, snapshot_sequence):
+        """
+        Loads the persisted approximate index, only if it was saved along with the loaded snapshot and the snapshot
+        kept its ring layout (not re-inserted at another capacity or precision). Otherwise the index is retrained the
+        first time it is needed.
+        """
+        if (self._relaid_out or not self._index.load(self.index_path) or self._index.sequence != snapshot_sequence
+                or self._index.layout != self._layout()):
+            self._index = type(self._index)(self.max_documents)
+
+    def _load_legacy_snapshot(self):
+        """
+        Loads a single-pickle collection (documents, embeddings and metadata lists). Returns the snapshot sequence,
+        0 since these collections predate the log.
+        """
+        self._relaid_out = True
+        with open(self.file_path, 'rb') as f:
+            data = pickle.load(f)
+            for document, embedding, metadata in zip(data.get('documents', []),
+                                                     data.get('embeddings', []),
+                                                     data.get('metadatas', [])):
+                self._append(document, embedding, metadata)
+
+        return 0
+
+    def _replay_log(self, snapshot_sequence):
+        """
+        Re-applies the log records newer than the snapshot and truncates the log after its last complete record.
+        """
+        if not os.path.exists(self.log_path):
+            return
+
+        valid_offset = 0
+        with open(self.log_path, 'rb') as f:
+            while True:
+                header = f.read(_LOG_RECORD_HEADER.size)
+                if len(header) < _LOG_RECORD_HEADER.size:
+                    break
+
+                (length,) = _LOG_RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    break
+
+                try:
+                    sequence, document, embedding, metadata, *replaced = pickle.loads(payload)
+                except Exception:
+                    break
+
+                valid_offset = f.tell()
+                self._log_records += 1
+                if sequence > snapshot_sequence:
+                    if not replaced:
+                        self._append(document, embedding, metadata)
+                    elif (slot := self._replaced_slot(replaced[0])) is not None:
+                        self._replace(slot, document, embedding, metadata)
+                    self._sequence = sequence
+
+        if valid_offset < os.path.getsize(self.log_path) and not self.read_only:
+            logger.warning(f"Agent-Module: [key='Memories'] | Discarding torn record at the end of {self.log_path}")
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(valid_offset)
+
+    def _replaced_slot(self, replaced):
+        """
+        Resolves the document replaced by a logged merge to its current slot. Returns None when that document is no
+        longer in the ring (snapshot re-inserted at a smaller capacity): the merged document takes the ring position
+        of the document it replaces, so it is evicted along with it and the merge is skipped.
+        """
+        if replaced['age'] < self._size:
+            return int((self._next_slot - 1 - replaced['age']) % self.max_documents)
+
+        logger.warning(f"Agent-Module: [key='Memories'] | {self.log_path}: document replaced by a logged merge is no "
+                       f"longer stored, skipping the merge")
+        return None
+
+    def _append_to_log(self, document, embedding, metadata, slot=None, flush=True):
+        """
+        Appends a single insert to the log, an O(1) write regardless of the collection size. In-place replacements
+        (near-duplicate merges) also record the age of the replaced document (see `_age`), which identifies it
+        whatever the ring layout the log is replayed on. Batched inserts only flush the log after their last record.
         """
-        if os.path.exists(self.file_path):
-            with open(self.file_path, 'rb') as f:
-                data = pickle.load(f)
-                self._documents.extend(data.get('documents', []))
-                self._embeddings.extend(data.get('embeddings', []))
-                self._metadatas.extend(data.get('metadatas', []))
+        if self._log_file is None:
+            self._log_file = open(self.log_path, 'ab')
+
+        record = (self._sequence, document, embedding, metadata)
+        if slot is not None:
+            record += ({'age': self._age(slot)},)
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        self._log_file.write(_LOG_RECORD_HEADER.pack(len(payload)) + payload)
+        if flush:
+            self._log_file.flush()
+        self._log_records += 1
 
     def _save_memory(self):
         """
-        Saves the current state of the memory (documents, embeddings, and metadata) to a file.
-        
-        This method is called after adding a new document to ensure the memory is persistent.
+        Compacts the memory: atomically rewrites the snapshot (embeddings, documents and metadata) then empties the log.
+
+        The snapshot records the sequence number of the last insert it contains, so a crash before the log is emptied
+        never duplicates documents on the next load.
         """
-        with open(self.file_path, 'wb') as f:
-            pickle.dump({
-                'documents': list(self._documents),
-                'embeddings': list(self._embeddings),
-                'metadatas': list(self._metadatas)
-            }, f)
+        snapshot = {
+            'embeddings': self._embeddings,
+            'precision': self.precision,
+            'documents': self._documents,
+            'type_codes': self._type_codes,
+            'type_names': self._type_names,
+            'timestamps': self._timestamps,
+            'scales': self._scales,
+            'next_slot': self._next_slot,
+            'size': self._size,
+            'sequence': self._sequence
+        }
+        temporary_path = f'{self.snapshot_path}.tmp'
+        with open(temporary_path, 'wb') as f:
+            write_snapshot(f, snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # The current mapping must be released before replacing its file (required on Windows)
+        self._embeddings = snapshot = None
+        os.replace(temporary_path, self.snapshot_path)
+        self._embeddings = map_embeddings(self.snapshot_path)
+        if self._index is not None:
+            self._index.sequence = self._sequence
+            self._index.layout = self._layout()
+            self._index.save(self.index_path)
+
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+        if os.path.exists(self.log_path):
+            os.truncate(self.log_path, 0)
+        self._log_records = 0
 
     def add_document(self, document, doc_type, timestamp=None):
         """
@@ -75,58 +512,316 @@ class Memories:
             document (str): The document content to be added.
             doc_type (str): The type of document (e.g., "text", "note").
             timestamp (float, optional): The timestamp of when the document was added. If None, the current time is used.
+
+        Returns:
+            Future | None: With a batch writer, the future of the queued insert (failed with the write error).
         """
-        embedding = self.model.encode(document, show_progress_bar=False)
+        if self._refuse_closed(1):
+            return None
+
         metadatas = {"type": doc_type, "timestamp": timestamp if timestamp else time.time()}
+        if self._writer is not None:
+            return self._writer.submit(self, document, metadatas)
+
+        embedding = self._normalize(self.model.encode(document, show_progress_bar=False))
+        with self._lock:
+            # The collection may have been closed while the document was encoded
+            if not self._refuse_closed(1):
+                self._add(document + '\n', embedding, metadatas)
+        return None
+
+    def insert_encoded(self, documents, embeddings, metadatas):
+        """
+        Adds already encoded documents (a `BatchWriter` batch), flushing the log once for the whole batch.
+
+        Args:
+            documents (list[str]): The documents content.
+            embeddings (list | np.ndarray): Their embeddings.
+            metadatas (list[dict]): Their metadata, with a "type" and a "timestamp" key.
+        """
+        with self._lock:
+            if self._refuse_closed(len(documents)):
+                return
+
+            for document, embedding, metadata in zip(documents, self._normalize(embeddings), metadatas):
+                self._add(document + '\n', embedding, metadata, flush=False)
+            if self._log_file is not None:
+                self._log_file.flush()
+
+    def _refuse_closed(self, count):
+        """
+        Returns True, logging the dropped inserts, if the collection is closed: its log and model are released, so
+        late writers (an executor thread still running after its routine was cancelled) must not write anymore.
+        """
+        if not self._closed:
+            return False
+
+        logger.warning(f"Agent-Module: [key='Memories'] | Dropping {count} inserts to closed collection "
+                       f"{self.file_path}")
+        return True
+
+    def _add(self, document, embedding, metadata, flush=True):
+        """
+        Inserts a document, unless it is a near-duplicate to skip or merge. Must hold the lock.
+        """
+        duplicate = self._find_duplicate(embedding, metadata['type'])
+        if duplicate is None:
+            self._insert(document, embedding, metadata, flush=flush)
+        elif self.duplicate_policy == 'merge':
+            self.suppressed['merged'] += 1
+            self._insert(document, embedding, metadata, slot=duplicate, flush=flush)
+        else:
+            self.suppressed['skipped'] += 1
+
+    def _flush_writes(self):
+        """
+        Writes the inserts still queued on the batch writer (read-your-writes). Must not hold the lock.
+        """
+        if self._writer is not None:
+            self._writer.flush()
+
+    def _find_duplicate(self, embedding, doc_type):
+        """
+        Returns the slot of the nearest document of the same type if it is a near-duplicate of `embedding`, else None.
+        Must hold the lock.
+        """
+        if self.duplicate_threshold is None or not self._size:
+            return None
+
+        slots = self._top_k(embedding[None], 1, self._filter_mask(doc_types=[doc_type]))[0]
+        if not len(slots) or float(self._dequantize(slots[:1])[0] @ embedding) < self.duplicate_threshold:
+            return None
+        return int(slots[0])
+
+    def _insert(self, document, embedding, metadata, slot=None, flush=True):
+        """
+        Appends a document to the ring buffer (or replaces `slot` in place) and logs it, compacting the log when
+        needed. Must hold the lock.
+        """
+        self._sequence += 1
+        if slot is None:
+            self._append(document, embedding, metadata)
+        else:
+            self._replace(slot, document, embedding, metadata)
+        if self.read_only:
+            return
 
-        self._documents.append(document + '\n')
-        self._embeddings.append(embedding)
-        self._metadatas.append(metadatas)
+        self._append_to_log(document, embedding, metadata, slot, flush)
+        if self._log_records >= self.compact_every:
+            self._save_memory()
 
-        self._save_memory()
+    async def aadd_document(self, document, doc_type, timestamp=None):
+        """
+        Non-blocking `add_document`: encoding and the log write run on the memories executor.
+        """
+        await asyncio.get_running_loop().run_in_executor(_executor, self.add_document, document, doc_type, timestamp)
 
     def get_all_documents(self):
         """
-        Retrieves all documents, embeddings, and metadata stored in memory.
+        Retrieves all documents, embeddings, and metadata stored in memory, from the oldest to the newest.
 
         Returns:
             tuple: A tuple containing three lists:
                 - List of all documents.
-                - List of all document embeddings.
+                - List of all (normalised) document embeddings.
                 - List of all document metadata.
         """
-        return list(self._documents), list(self._embeddings), list(self._metadatas)
+        self._flush_writes()
+        with self._lock:
+            slots = self._ordered_slots()
+            return ([self._documents[slot] for slot in slots],
+                    list(self._dequantize(slots)),
+                    [self._metadata(slot) for slot in slots])
 
-    def query_multiple(self, queries, n_results=5):
+    def _rank(self, candidates, similarities, n_results):
         """
-        Queries the memory for the most similar documents to the given queries.
+        Returns the `n_results` best candidate slots sorted by similarity then recency, sorting only the top-k slice.
+        """
+        k = min(n_results, len(candidates))
+        if k < len(candidates):
+            best = np.argpartition(-similarities, k - 1)[:k]
+            candidates, similarities = candidates[best], similarities[best]
+
+        return candidates[np.lexsort((-self._timestamps[candidates], -similarities))]
+
+    def _top_k(self, query_embeddings, n_results, mask=None):
+        """
+        Returns, for each query row, the slots of the `n_results` most similar documents sorted by similarity then
+        recency. Only the slots selected by `mask` (see `_filter_mask`) are scored.
+
+        When the approximate index can answer, each query only scores its candidate slots. Otherwise all queries are
+        scored with one (Q x N) matrix product, and candidates are selected with `argpartition` so only the top-k
+        slice of each row is ever sorted.
+        """
+        pool = None if mask is None else np.flatnonzero(mask)
+        k = min(n_results, self._size if pool is None else len(pool))
+        if k <= 0:
+            return np.empty((len(query_embeddings), 0), dtype=np.intp)
+
+        if self._index is not None:
+            candidate_slots = [self._index.candidates(query_embedding, self._embeddings, self._size)
+                               for query_embedding in query_embeddings]
+            if all(candidates is not None for candidates in candidate_slots):
+                if mask is not None:
+                    candidate_slots = [candidates[mask[candidates]] for candidates in candidate_slots]
+                return [self._rank(candidates, self._dequantize(candidates) @ query_embedding, k)
+                        for candidates, query_embedding in zip(candidate_slots, query_embeddings)]
+
+        similarities = self._scores(query_embeddings, pool)
+        if k < similarities.shape[1]:
+            candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(similarities.shape[1]), similarities.shape)
+
+        candidate_similarities = np.take_along_axis(similarities, candidates, axis=1)
+        slots = candidates if pool is None else pool[candidates]
+        order = np.lexsort((-self._timestamps[slots], -candidate_similarities), axis=1)
+        return np.take_along_axis(slots, order, axis=1)
+
+    def _retrieve(self, query_embeddings, n_results, doc_types=None, since=None, until=None):
+        """
+        Returns, for each query, up to `n_results` (similarity, timestamp, document) hits sorted best first.
+
+        The cold tier is only scanned for the queries whose best hot similarity is under `cold_threshold`, and the
+        cold documents making it into the results are promoted to the hot tier. Must hold the lock.
+        """
+        mask = self._filter_mask(doc_types, since, until)
+        results = []
+        for query_embedding, slots in zip(query_embeddings, self._top_k(query_embeddings, n_results, mask)):
+            slots = np.asarray(slots, dtype=np.intp)
+            similarities = self._dequantize(slots) @ query_embedding
+            results.append([(float(similarity), float(self._timestamps[slot]), self._documents[slot])
+                            for similarity, slot in zip(similarities, slots)])
+
+        if self._cold is None or not len(self._cold):
+            return results
+
+        type_codes = None
+        if doc_types is not None:
+            type_codes = [self._type_names.index(doc_type) for doc_type in doc_types if doc_type in self._type_names]
+
+        promoted = {}
+        for query_embedding, hits in zip(query_embeddings, results):
+            if hits and hits[0][0] >= self.cold_threshold:
+                continue
+
+            hot_documents = {document for _, _, document in hits}
+            for similarity, timestamp, row in self._cold.search(query_embedding, n_results, type_codes, since, until):
+                document = self._cold.document(row)
+                if document not in hot_documents:
+                    hits.append((similarity, timestamp, document))
+                    promoted.setdefault(document, row)
+
+            hits.sort(key=lambda hit: (hit[0], hit[1]), reverse=True)
+            del hits[n_results:]
+
+        retrieved = {document for hits in results for _, _, document in hits}
+        for document, row in promoted.items():
+            if document in retrieved:
+                type_code, timestamp = self._cold.metadata(row)
+                self._insert(document, self._cold.embedding(row),
+                             {"type": self._type_names[type_code], "timestamp": timestamp})
+
+        return results
+
+    def query_batch(self, queries, n_results=5, doc_types=None, since=None, until=None):
+        """
+        Queries the memory for all queries at once: a single `encode` call and a single similarity pass.
 
         Args:
             queries (list): A list of query strings.
             n_results (int): The number of top results to return for each query (default is 5).
+            doc_types (Iterable[str], optional): Only retrieve documents of these types (e.g. {'MEMORY', 'PLAN'}).
+            since (float, optional): Only retrieve documents with a timestamp greater or equal to this one.
+            until (float, optional): Only retrieve documents with a timestamp lower or equal to this one.
 
         Returns:
-            list: A list of the top `n_results` most similar documents for each query.
+            tuple: A tuple containing:
+                - List of result lists, one per query, in query order.
+                - Merged list of every query results, in the same order as `query_multiple`.
+        """
+        self._flush_writes()
+        if not (self._size or (self._cold is not None and len(self._cold))) or not queries:
+            return [[] for _ in queries], []
+
+        query_embeddings = self._normalize(self.model.encode(list(queries), show_progress_bar=False))
+        with self._lock:
+            per_query = [
+                [document for _, _, document in hits if document]
+                for hits in self._retrieve(query_embeddings, n_results, doc_types, since, until)
+            ]
+
+        return per_query, [document for results in per_query for document in results]
+
+    async def aquery_batch(self, queries, n_results=5, doc_types=None, since=None, until=None):
         """
-        if not self._embeddings:
+        Non-blocking `query_batch`: encoding and scoring run on the memories executor.
+        """
+        return await asyncio.get_running_loop().run_in_executor(_executor, self.query_batch, queries, n_results,
+                                                                doc_types, since, until)
+
+    def query_merged(self, queries, n_results=5, max_chars=None, max_tokens=None, doc_types=None, since=None,
+                     until=None):
+        """
+        Queries the memory for all queries at once and merges the results into one deduplicated, globally ranked list
+        cut to a character and/or token budget. Used to build a bounded memory section for the module prompts.
+
+        Each document is ranked by its best similarity over all queries (then recency), so a document retrieved by
+        several queries appears once, at its best rank.
+
+        Args:
+            queries (list): A list of query strings.
+            n_results (int): The number of top results retrieved for each query before merging (default is 5).
+            max_chars (int, optional): Character budget of the returned documents, unlimited if None.
+            max_tokens (int, optional): Estimated token budget of the returned documents, unlimited if None.
+            doc_types (Iterable[str], optional): Only retrieve documents of these types.
+            since (float, optional): Only retrieve documents with a timestamp greater or equal to this one.
+            until (float, optional): Only retrieve documents with a timestamp lower or equal to this one.
+
+        Returns:
+            list: Unique documents, best first, fitting in the budget.
+        """
+        self._flush_writes()
+        if not (self._size or (self._cold is not None and len(self._cold))) or not queries:
             return []
 
-        results = []
-        for query in queries:
-            query_embedding = self.model.encode(query)
-            similarities = cosine_similarity([query_embedding], list(self._embeddings))[0]
+        query_embeddings = self._normalize(self.model.encode(list(queries), show_progress_bar=False))
+        with self._lock:
+            best = {}
+            for hits in self._retrieve(query_embeddings, n_results, doc_types, since, until):
+                for similarity, timestamp, document in hits:
+                    if document and (document not in best or best[document] < (similarity, timestamp)):
+                        best[document] = (similarity, timestamp)
 
-            docs_with_metadata = [
-                {'doc': doc, 'metadata': metadata, 'similarity': similarity}
-                for doc, metadata, similarity in zip(self._documents, self._metadatas, similarities)
-            ]
+        documents = sorted(best, key=best.get, reverse=True)
+        return fit_to_budget(documents, max_chars, max_tokens)
+
+    async def aquery_merged(self, queries, n_results=5, max_chars=None, max_tokens=None, doc_types=None, since=None,
+                            until=None):
+        """
+        Non-blocking `query_merged`: encoding and scoring run on the memories executor.
+        """
+        return await asyncio.get_running_loop().run_in_executor(_executor, self.query_merged, queries, n_results,
+                                                                max_chars, max_tokens, doc_types, since, until)
+
+    def query_multiple(self, queries, n_results=5, doc_types=None, since=None, until=None):
+        """
+        Queries the memory for the most similar documents to the given queries.
 
-            sorted_docs = sorted(
-                docs_with_metadata,
-                key=lambda x: (x['similarity'], x['metadata'].get('timestamp', 0)),
-                reverse=True
-            )
+        Args:
+            queries (list): A list of query strings.
+            n_results (int): The number of top results to return for each query (default is 5).
+            doc_types (Iterable[str], optional): Only retrieve documents of these types.
+            since (float, optional): Only retrieve documents with a timestamp greater or equal to this one.
+            until (float, optional): Only retrieve documents with a timestamp lower or equal to this one.
 
-            results.extend([result['doc'] for result in sorted_docs[:n_results] if result['doc']])
+        Returns:
+            list: A list of the top `n_results` most similar documents for each query.
+        """
+        return self.query_batch(queries, n_results, doc_types, since, until)[1]
 
-        return results
+    async def aquery_multiple(self, queries, n_results=5, doc_types=None, since=None, until=None):
+        """
+        Non-blocking `query_multiple`: encoding and scoring run on the memories executor.
+        """
+        return (await self.aquery_batch(queries, n_results, doc_types, since, until))[1]
@@ -1,8 +1,8 @@
-import ollama
-
 from configs.ollama_options import AGENT_PLANNING_OPTIONS
-from utils.agent.agent_utils import _wait_time_out, clean_module_output
+from modules.llm_gateway import LLMGateway, shared_gateway
+from utils.agent.agent_utils import clean_module_output, compact_prompt
 from utils.agent.base_prompts import planner_base
+from utils.agent.prompt_budget import PromptBudget
 
 
 class Planner:
@@ -13,8 +13,9 @@ class Planner:
     - refine_plan: Refines and generates a new plan based on the provided context, memories, channel context, and prior plans.
     """
 
-    def __init__(self, model):
+    def __init__(self, model, llm: LLMGateway | None = None):
         self.model = model
+        self.llm = llm or shared_gateway()
 
     async def make_plan(self, plan, context, memories, channel_context, argent_base_prompt):
         """
@@ -31,38 +32,41 @@ class Planner:
             str: A refined plan based on reflection and context.
         """
 
-        memories = '\n'.join(memories)
+        budget = PromptBudget('make_plan', AGENT_PLANNING_OPTIONS)
+        channel_context = budget.text('channel_context', channel_context)
+        plan = budget.text('plan', plan)
+        memories = '\n'.join(budget.items('memories', memories))
+        context = budget.text('context', context)
 
-        system_instruction = f"""
+        # Static prefix first (identical across calls, so the server reuses its KV cache), volatile sections after
+        system_instruction = compact_prompt(f"""
         {argent_base_prompt}
-        
+
+        {planner_base}
+        """)
+
+        prompt = compact_prompt(f"""
         Channel context:
         {channel_context}
-        
+
         My previous plan:
         {plan}
-        
+
         Memories:
         {memories}
-        """
 
-        prompt = f"""
-        {planner_base}
-        
         Current context:
         {context}
-        """
+        """)
+        budget.log_usage(system_instruction, prompt)
 
-        response = await _wait_time_out(
-            ollama.AsyncClient().generate(
-                model=self.model,
-                prompt=prompt,
-                system=system_instruction,
-                options=AGENT_PLANNING_OPTIONS
-            ),
-            timeout=120,
-            timeout_message="Query Generation Aborted! Model waited for 3 minutes",
+        response = await self.llm.generate(
+            'make_plan',
+            model=self.model,
+            prompt=prompt,
+            system=system_instruction,
+            options=AGENT_PLANNING_OPTIONS,
             default_return="I want to answer to everything"
         )
 
-        return clean_module_output(response['response'])
+        return clean_module_output(response)
@@ -1,7 +1,7 @@
-import ollama
-
 from configs.ollama_options import AGENT_RESPONSE_OPTIONS
-from utils.agent.agent_utils import clean_response, _wait_time_out
+from modules.llm_gateway import LLMGateway, shared_gateway
+from utils.agent.agent_utils import clean_response, compact_prompt
+from utils.agent.prompt_budget import PromptBudget
 
 
 class Responder:
@@ -15,13 +15,18 @@ class Responder:
     - clean_response: Cleans and formats the generated response.
     """
 
-    def __init__(self, model):
+    def __init__(self, model, llm: LLMGateway | None = None):
         self.model = model
+        self.llm = llm or shared_gateway()
 
-    async def make_response(self, plan, context, memories, messages, agent_base_prompt, last_messages=None):
+    async def make_response(self, plan, context, memories, messages, agent_base_prompt, last_messages=None,
+                            stream=False, on_first_token=None):
         """
         Generates a response to a Discord conversation based on the provided context, plan, memories, and messages.
 
+        In streaming mode, tokens are consumed as they arrive and the generation is stopped as soon as the first
+        non-empty line is complete, instead of waiting for the whole completion.
+
         Args:
             plan (str): The current plan or intention for the conversation.
             context (str): The relevant context from the ongoing conversation.
@@ -29,6 +34,9 @@ class Responder:
             messages (list): A list of the latest messages to be included in the response.
             agent_base_prompt (str): The personality description of the responder.
             last_messages (list, optional): A list of the last 5 messages sent by the user.
+            stream (bool): Whether to stream the generation.
+            on_first_token (callable, optional): Called (without arguments) when the first non-blank token of a
+                streamed response arrives, e.g. to show a typing indicator.
 
         Returns:
             str: A concise, context-aware response.
@@ -37,7 +45,12 @@ class Responder:
         if last_messages is None:
             last_messages = []
 
-        msgs = '\n'.join(messages)
+        budget = PromptBudget('make_response', AGENT_RESPONSE_OPTIONS)
+        plan = budget.text('plan', plan)
+        context = budget.text('context', context)
+        msgs = '\n'.join(budget.items('messages', messages, keep='last'))
+        last_messages = budget.items('last_messages', last_messages, keep='last')
+        memories = budget.items('memories', memories or [])
 
         if last_messages:
             last_msgs = '\n'.join(last_messages)
@@ -49,41 +62,72 @@ class Responder:
         else:
             memories = "No memories"
 
-        system_instruction = f"""
-You are a Discord user with the following personality:
+        # Static prefix first (identical across calls, so the server reuses its KV cache), volatile sections after
+        system_instruction = compact_prompt(f"""
 {agent_base_prompt}
 
+You are a Discord user with the personality above.
+Skip the greetings. You're reading the chat and responding as you feel.
+Reply immediately but don't repeat yourself or what is being said.
+Bring new beef to the table! Keep responses brief, like 1–2 sentences max, like a Discord message, unless maybe a longer answer is really needed.
+""")
+
+        prompt = compact_prompt(f"""
 What you were planning on doing:
-{plan} 
+{plan}
 
 What you can remember:
 {memories}
 
-----
-
 The last 5 messages your sent were:
 {last_msgs}
 
 {context}
 
-Skip the greetings. You're reading the chat and responding as you feel. 
-Reply immediately but don't repeat yourself or what is being said. 
-Bring new beef to the table! Keep responses brief, like 1–2 sentences max, like a Discord message, unless maybe a longer answer is really needed.
-"""
-
-        response = await _wait_time_out(
-            ollama.AsyncClient().generate(
-                model=self.model,
-                system=system_instruction,
-                prompt=f"\n{msgs}",
-                options=AGENT_RESPONSE_OPTIONS,
-                stream=False
-            ),
-            timeout=60,
-            timeout_message="Response Generation Aborted!"
+----
+
+{msgs}
+""")
+        budget.log_usage(system_instruction, prompt)
+
+        if stream:
+            return await self._stream_response(prompt, system_instruction, on_first_token)
+
+        response = await self.llm.generate(
+            'make_response',
+            model=self.model,
+            prompt=prompt,
+            system=system_instruction,
+            options=AGENT_RESPONSE_OPTIONS
         )
 
-        return clean_response(response['response'])
+        return clean_response(response)
+
+    async def _stream_response(self, prompt, system_instruction, on_first_token=None):
+        """
+        Streams a response and returns its first complete, cleaned line.
+        Leading blank lines are skipped, so a model opening with a newline does not produce an empty message.
+        """
+        line = ''
+        stream = self.llm.stream('make_response', model=self.model, prompt=prompt, system=system_instruction,
+                                 options=AGENT_RESPONSE_OPTIONS)
+        try:
+            async for chunk in stream:
+                if not line.strip():
+                    chunk = (line + chunk).lstrip()
+                    line = ''
+                    if chunk and on_first_token is not None:
+                        on_first_token()
+
+                if '\n' in chunk:
+                    line += chunk.split('\n', 1)[0]
+                    break
+                line += chunk
+        finally:
+            # Closing the stream ends the request, the server stops generating the rest of the completion
+            await stream.aclose()
+
+        return clean_response(line)
 
     async def new_discussion(self, plan, argent_base_prompt):
         """
@@ -97,26 +141,25 @@ Bring new beef to the table! Keep responses brief, like 1–2 sentences max, lik
             str: A spontaneous message to start a new discussion.
         """
 
-        system_instruction = f"""
-        {argent_base_prompt}
-        
+        budget = PromptBudget('new_discussion', AGENT_RESPONSE_OPTIONS)
+        plan = budget.text('plan', plan)
+
+        system_instruction = compact_prompt(argent_base_prompt)
+
+        prompt = compact_prompt(f"""
         You plan was to {plan}
-        """
 
-        prompt = f"""
         No one is talking so maybe you should start a new discussion! Just be spontanous and tell us about what u like or want to do or were doing!
-        """
-
-        response = await _wait_time_out(
-            ollama.AsyncClient().generate(
-                model=self.model,
-                prompt=prompt,
-                system=system_instruction,
-                options=AGENT_RESPONSE_OPTIONS
-            ),
-            timeout=120,
-            timeout_message="Response Generation Aborted! Model waited for 3 minutes",
+        """)
+        budget.log_usage(system_instruction, prompt)
+
+        response = await self.llm.generate(
+            'new_discussion',
+            model=self.model,
+            prompt=prompt,
+            system=system_instruction,
+            options=AGENT_RESPONSE_OPTIONS,
             default_return="Hi"
         )
 
-        return clean_response(response['response'])
+        return clean_response(response)
@@ -1,8 +1,8 @@
-import ollama
-
 from configs.ollama_options import CONTEXTUALIZER_NEUTRAL_OPTIONS, REFLECTIONS_OPTIONS
-from utils.agent.agent_utils import clean_module_output, _wait_time_out
+from modules.llm_gateway import LLMGateway, shared_gateway
+from utils.agent.agent_utils import clean_module_output, compact_prompt
 from utils.agent.base_prompts import neutral_base, engaged_base
+from utils.agent.prompt_budget import PromptBudget
 
 
 class Contextualizer:
@@ -14,8 +14,9 @@ class Contextualizer:
     - Reflections, taking agent personality biaises into account (memories)
     """
 
-    def __init__(self, model):
+    def __init__(self, model, llm: LLMGateway | None = None):
         self.model = model
+        self.llm = llm or shared_gateway()
 
     async def summurize_transcript(self, messages, bot_context):
         """
@@ -28,33 +29,32 @@ class Contextualizer:
         Returns:
             str: A concise summary paragraph written in a neutral tone.
         """
-        msgs = '\n'.join([f"{msg}" for msg in messages])
+        budget = PromptBudget('summurize_transcript', CONTEXTUALIZER_NEUTRAL_OPTIONS)
+        bot_context = budget.text('bot_context', bot_context)
+        msgs = '\n'.join([f"{msg}" for msg in budget.items('transcript', messages, keep='last')])
+
+        # The real-time bot context (timestamp) comes after the static instructions, so their KV cache is reused
+        system = compact_prompt(neutral_base)
 
-        system = f"""
+        prompt = compact_prompt(f"""
         {bot_context}
-        """
 
-        prompt = f"""
-        {neutral_base}
-        
         The transcript to write about immediately:
         {msgs}
-        """
+        """)
+        budget.log_usage(system, prompt)
 
         if messages:
-            response = await _wait_time_out(
-                ollama.AsyncClient().generate(
-                    model=self.model,
-                    prompt=prompt,
-                    system=system,
-                    options=CONTEXTUALIZER_NEUTRAL_OPTIONS
-                ),
-                timeout=120,
-                timeout_message="Summury Generation Aborted!",
+            response = await self.llm.generate(
+                'summurize_transcript',
+                model=self.model,
+                prompt=prompt,
+                system=system,
+                options=CONTEXTUALIZER_NEUTRAL_OPTIONS,
                 default_return="Nothing seems to be happening here."
             )
 
-            return clean_module_output(response['response'])
+            return clean_module_output(response)
 
         return "Reading the discord conversation, I can observe that there is no messages at the moment. I should consider sparking a new topic."
 
@@ -70,30 +70,28 @@ class Contextualizer:
             str: A personal reflection paragraph written in a casual, introspective tone.
         """
 
-        msgs = '\n'.join([f"{msg}" for msg in messages])
+        budget = PromptBudget('summurize_into_memory', REFLECTIONS_OPTIONS)
+        msgs = '\n'.join([f"{msg}" for msg in budget.items('transcript', messages, keep='last')])
 
-        system = f"""
+        system = compact_prompt(f"""
         {agent_base_prompt}
-        """
 
-        prompt = f"""
         {engaged_base}
-        
-        
+        """)
+
+        prompt = compact_prompt(f"""
         Based on your personality, here is transcript to reflection about:
         {msgs}
-        """
-
-        response = await _wait_time_out(
-            ollama.AsyncClient().generate(
-                model=self.model,
-                prompt=prompt,
-                system=system,
-                options=REFLECTIONS_OPTIONS
-            ),
-            timeout=120,
-            timeout_message="Reflection Generation Aborted! Model waited for 3 minutes",
+        """)
+        budget.log_usage(system, prompt)
+
+        response = await self.llm.generate(
+            'summurize_into_memory',
+            model=self.model,
+            prompt=prompt,
+            system=system,
+            options=REFLECTIONS_OPTIONS,
             default_return=""
         )
 
-        return clean_module_output(response['response'])
+        return clean_module_output(response)
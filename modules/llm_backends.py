@@ -0,0 +1,148 @@
+import json
+import os
+
+import httpx
+import ollama
+
+# Ollama options understood by OpenAI-compatible servers, with their request field. Standard fields are honoured by
+# every server; the llama.cpp sampling extensions (repeat_penalty, mirostat, top_k) are ignored by servers without them.
+# Server-side settings (num_ctx) and Ollama-only options (penalize_newline) are dropped.
+OPENAI_OPTION_FIELDS = {
+    'num_predict': 'max_tokens',
+    'stop': 'stop',
+    'temperature': 'temperature',
+    'top_p': 'top_p',
+    'top_k': 'top_k',
+    'seed': 'seed',
+    'presence_penalty': 'presence_penalty',
+    'frequency_penalty': 'frequency_penalty',
+    'repeat_penalty': 'repeat_penalty',
+    'mirostat': 'mirostat',
+    'mirostat_tau': 'mirostat_tau',
+    'mirostat_eta': 'mirostat_eta',
+}
+
+
+class OllamaBackend:
+    """
+    Ollama server (`/api/generate`), through a pooled `ollama.AsyncClient`.
+
+    Responses are returned as-is: a 'response' text plus the server metrics (prompt_eval_count, prompt_eval_duration,
+    eval_count, eval_duration, durations in nanoseconds), the shape every backend returns.
+    """
+
+    def __init__(self, host: str | None, timeout: httpx.Timeout, limits: httpx.Limits, keep_alive: str | float):
+        self.keep_alive = keep_alive
+        self._client = ollama.AsyncClient(host=host, timeout=timeout, limits=limits)
+
+    async def generate(self, model, prompt, system, options):
+        return await self._client.generate(model=model, prompt=prompt, system=system, options=options, stream=False,
+                                           keep_alive=self.keep_alive)
+
+    async def stream(self, model, prompt, system, options):
+        """Starts a streamed generation, returns the async iterator of its parts (the last one has 'done' set)."""
+        return await self._client.generate(model=model, prompt=prompt, system=system, options=options, stream=True,
+                                           keep_alive=self.keep_alive)
+
+    async def preload(self, model):
+        # An empty prompt only loads the model
+        await self._client.generate(model=model, prompt='', keep_alive=self.keep_alive)
+
+    async def aclose(self):
+        await self._client._client.aclose()
+
+
+class OpenAIBackend:
+    """
+    OpenAI-compatible server (`/v1/chat/completions`), e.g. llama.cpp server or vLLM.
+
+    These servers batch the requests of their parallel slots into shared forward passes (continuous batching), so
+    concurrent calls from many agents are decoded together instead of queueing: the gateway concurrency should match
+    the server slots (llama.cpp `--parallel`, vLLM `--max-num-seqs`). The chat template is applied by the server.
+    `keep_alive` does not apply, the model stays loaded for the lifetime of the server.
+
+    Responses are converted to the Ollama response shape (see `OllamaBackend`).
+    """
+
+    def __init__(self, host: str | None, timeout: httpx.Timeout, limits: httpx.Limits, keep_alive=None):
+        headers = {}
+        if os.getenv('OPENAI_API_KEY'):
+            headers['Authorization'] = f"Bearer {os.getenv('OPENAI_API_KEY')}"
+        self._client = httpx.AsyncClient(base_url=host or 'http://localhost:8080', timeout=timeout, limits=limits,
+                                         headers=headers)
+
+    @staticmethod
+    def request(model, prompt, system, options, stream) -> dict:
+        """Body of a chat completion request from Ollama-style arguments."""
+        messages = [{'role': 'system', 'content': system}] if system else []
+        messages.append({'role': 'user', 'content': prompt})
+        body = {'model': model, 'messages': messages, 'stream': stream}
+        for name, value in (options or {}).items():
+            if name in OPENAI_OPTION_FIELDS:
+                body[OPENAI_OPTION_FIELDS[name]] = value
+        if stream:
+            body['stream_options'] = {'include_usage': True}
+        return body
+
+    @staticmethod
+    def _metrics(payload: dict) -> dict:
+        """
+        Ollama-style metrics of a completion. llama.cpp `timings` count the prompt tokens actually evaluated (after
+        its prompt cache), like Ollama; otherwise the usage counts are used.
+        """
+        usage, timings = payload.get('usage') or {}, payload.get('timings') or {}
+        return {
+            'prompt_eval_count': timings.get('prompt_n', usage.get('prompt_tokens', 0)),
+            'prompt_eval_duration': int(timings.get('prompt_ms', 0) * 1e6),
+            'eval_count': timings.get('predicted_n', usage.get('completion_tokens', 0)),
+            'eval_duration': int(timings.get('predicted_ms', 0) * 1e6),
+        }
+
+    async def generate(self, model, prompt, system, options):
+        response = await self._client.post('/v1/chat/completions',
+                                           json=self.request(model, prompt, system, options, stream=False))
+        response.raise_for_status()
+        payload = response.json()
+        return {'response': payload['choices'][0]['message']['content'] or '', 'done': True, **self._metrics(payload)}
+
+    async def stream(self, model, prompt, system, options):
+        """Starts a streamed generation (server-sent events), returns the async iterator of its parts."""
+        request = self._client.build_request('POST', '/v1/chat/completions',
+                                             json=self.request(model, prompt, system, options, stream=True))
+        response = await self._client.send(request, stream=True)
+        response.raise_for_status()
+        return self._parts(response)
+
+    async def _parts(self, response: httpx.Response):
+        try:
+            metrics = {}
+            async for line in response.aiter_lines():
+                if not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+
+                payload = json.loads(data)
+                if payload.get('usage') or payload.get('timings'):
+                    metrics = self._metrics(payload)
+                for choice in payload.get('choices') or []:
+                    text = (choice.get('delta') or {}).get('content')
+                    if text:
+                        yield {'response': text, 'done': False}
+            yield {'response': '', 'done': True, **metrics}
+        finally:
+            # Closing the response ends the request, the server stops generating
+            await response.aclose()
+
+    async def preload(self, model):
+        pass
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+BACKENDS = {
+    'ollama': OllamaBackend,
+    'openai': OpenAIBackend,
+}
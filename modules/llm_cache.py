@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    Persistent, content-addressed cache of LLM generations.
+
+    A generation is identified by the SHA-256 of its (backend, host, model, system, prompt, options), so identical
+    calls to the same server made by re-runs of a benchmark or by sequential-mode agents are served from disk, and
+    generations of another server never answer for it. Entries live in a SQLite table and are evicted once older than
+    `ttl` seconds, or least recently used first once the cache holds `max_entries`.
+
+    Attributes:
+        path (str): SQLite file of the cache.
+        ttl (float | None): Entry lifetime in seconds, None for no expiry.
+        max_entries (int): Maximum number of cached generations.
+        hits (dict): Cache hits per module.
+        misses (dict): Cache misses per module.
+    """
+
+    def __init__(self, path: str, ttl: float | None = None, max_entries: int = 100_000):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )""")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    @staticmethod
+    def key(backend, host, model, system, prompt, options) -> str:
+        """Content address of a generation made by the `backend` server at `host`."""
+        payload = json.dumps([backend, host, model, system, prompt, options], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str, module: str = '') -> str | None:
+        """Returns the cached generation, or None on a miss (or an expired entry)."""
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                with self._connection:
+                    self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+
+            if row is None:
+                self.misses[module] = self.misses.get(module, 0) + 1
+                return None
+
+            with self._connection:
+                self._connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.hits[module] = self.hits.get(module, 0) + 1
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        """Stores a generation, evicting expired then least recently used entries beyond `max_entries`."""
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, response, now, now))
+            if self.ttl is not None:
+                self._connection.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+
+            (count,) = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_entries:
+                # Evicts 10% at once, so a full cache does not pay a DELETE per insert
+                self._connection.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries + self.max_entries // 10,))
+
+    def stats(self) -> dict:
+        """Returns hits, misses and hit rate per module, plus the number of cached entries."""
+        with self._lock:
+            (entries,) = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()
+            modules = {}
+            for module in sorted(set(self.hits) | set(self.misses)):
+                hits, misses = self.hits.get(module, 0), self.misses.get(module, 0)
+                modules[module] = {'hits': hits, 'misses': misses, 'hit_rate': hits / (hits + misses)}
+            return {'entries': entries, 'modules': modules}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
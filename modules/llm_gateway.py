@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import threading
+
+import httpx
+
+from configs.ollama_options import (CONNECT_TIMEOUT, DEFAULT_GENERATION_TIMEOUT, DEFAULT_LLM_BACKEND,
+                                    GENERATION_TIMEOUTS, KEEP_ALIVE, KEEPALIVE_EXPIRY, LLM_CACHE_MAX_ENTRIES,
+                                    LLM_CACHE_PATH, LLM_CACHE_TTL, MAX_CONCURRENT_REQUESTS, MAX_CONNECTIONS,
+                                    RESERVED_HIGH_PRIORITY_SLOTS, TASK_MODULES, TASK_PRIORITIES)
+from modules.llm_backends import BACKENDS
+from modules.llm_cache import ResponseCache
+from modules.llm_scheduler import LLMScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class LLMGateway:
+    """
+    Single entry point of every LLM call made by the agent modules (Responder, Planner, Contextualizer, QueryEngine).
+
+    The gateway owns one pooled client of its backend (see `modules/llm_backends.py`: Ollama or an OpenAI-compatible
+    server such as llama.cpp or vLLM) per event loop, so HTTP keep-alive connections are reused across calls, modules
+    and agents instead of opening a new connection pool per request. Timeouts are configured in one
+    place (`configs/ollama_options.py`), per task: a task is the name of the module method making the call.
+
+    Requests go through an `LLMScheduler`, which bounds the number of concurrent requests and serves them by the
+    priority class of their task (`TASK_PRIORITIES`), so background routines never delay a user-facing response.
+    The generation timeout starts once the request got its slot.
+
+    Generations of the modules enabled with `enable_cache` are served from a persistent `ResponseCache` when the
+    very same (model, system, prompt, options) was already generated by the same backend and host.
+
+    Every request asks the server to keep the model loaded for `keep_alive`, so the KV cache of the static prompt
+    prefixes survives between agent requests. Prompt-eval and generation token counts reported by the server are
+    accumulated per task (see `usage`).
+
+    Use `shared_gateway` to get the instance shared by every agent of the process.
+
+    Attributes:
+        host (str | None): Server URL, the backend default (`OLLAMA_HOST` for Ollama) if None.
+        backend (str): Server API, one of `BACKENDS` ('ollama' or 'openai').
+        max_connections (int): Maximum number of pooled HTTP connections.
+        keepalive_expiry (float): Seconds an idle connection is kept open.
+        keep_alive (str | float): How long the server keeps the model loaded after a request (Ollama only).
+        max_concurrency (int): Requests sent to the server at once, should match its parallel slots.
+    """
+
+    def __init__(self, host: str | None = None, max_connections: int = MAX_CONNECTIONS,
+                 keepalive_expiry: float = KEEPALIVE_EXPIRY, keep_alive: str | float = KEEP_ALIVE,
+                 backend: str = DEFAULT_LLM_BACKEND, max_concurrency: int = MAX_CONCURRENT_REQUESTS):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown LLM backend '{backend}', expected one of {sorted(BACKENDS)}")
+
+        self.host = host
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.keep_alive = keep_alive
+        self._usage: dict[str, dict] = {}
+        self._usage_lock = threading.Lock()
+        self.scheduler = LLMScheduler(max_concurrency, RESERVED_HIGH_PRIORITY_SLOTS)
+        self.cache: ResponseCache | None = None
+        self.cached_modules: set[str] = set()
+        # httpx connection pools are bound to the event loop they were created in
+        self._clients: dict[int, object] = {}
+
+    def client(self):
+        """Returns the pooled backend client of the running event loop, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        if id(loop) not in self._clients:
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections,
+                                  keepalive_expiry=self.keepalive_expiry)
+            # Generation time is bounded per task by `generate`, the HTTP timeout only guards the connection
+            timeout = httpx.Timeout(None, connect=CONNECT_TIMEOUT)
+            self._clients[id(loop)] = BACKENDS[self.backend](self.host, timeout, limits, self.keep_alive)
+        return self._clients[id(loop)]
+
+    def enable_cache(self, modules, path: str = LLM_CACHE_PATH, ttl: float | None = LLM_CACHE_TTL,
+                     max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        """
+        Caches the generations of `modules` (names from `TASK_MODULES`, e.g. 'contextualizer'). The cache is opened on
+        the first call; later calls only enable more modules.
+        """
+        unknown = set(modules) - set(TASK_MODULES.values())
+        if unknown:
+            raise ValueError(f"Unknown modules {sorted(unknown)}, expected some of {sorted(set(TASK_MODULES.values()))}")
+        if self.cache is None:
+            self.cache = ResponseCache(path, ttl, max_entries)
+        self.cached_modules.update(modules)
+
+    @staticmethod
+    def timeout(task: str) -> float:
+        return GENERATION_TIMEOUTS.get(task, DEFAULT_GENERATION_TIMEOUT)
+
+    async def generate(self, task, model, prompt, system='', options=None, default_return=''):
+        """
+        Runs a non-streamed generation, bounded by the timeout of `task`.
+
+        Args:
+            task (str): Name of the calling module method (e.g. 'make_response'), selects the timeout.
+            model (str): The model to use.
+            prompt (str): The user prompt.
+            system (str): The system prompt.
+            options (dict, optional): Ollama options (mapped to their equivalent by other backends).
+            default_return (str): Text returned if the generation times out.
+
+        Returns:
+            str: The generated text, or `default_return` on timeout.
+        """
+        module = TASK_MODULES.get(task, task)
+        cache_key = None
+        if self.cache is not None and module in self.cached_modules:
+            cache_key = ResponseCache.key(self.backend, self.host, model, system, prompt, options)
+            cached = self.cache.get(cache_key, module)
+            if cached is not None:
+                return cached
+
+        timeout = self.timeout(task)
+        async with self.scheduler.slot(TASK_PRIORITIES.get(task, 'medium')):
+            try:
+                response = await asyncio.wait_for(self.client().generate(model, prompt, system, options),
+                                                  timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Agent-Module: [key='LLMGateway'] | {task} aborted! Model waited for {timeout} seconds")
+                return default_return
+
+        self._record_usage(task, response)
+        if cache_key is not None:
+            self.cache.put(cache_key, response['response'])
+        return response['response']
+
+    async def stream(self, task, model, prompt, system='', options=None):
+        """
+        Runs a streamed generation, yielding text chunks as the server produces them. The request slot is held until
+        the stream is exhausted or closed, so a consumer stopping early (`break`) frees it right away. Generation stops
+        silently once the timeout of `task` is reached.
+
+        Only generations streamed to their end are cached; a cache hit is yielded as a single chunk.
+
+        Args:
+            task (str): Name of the calling module method (e.g. 'make_response'), selects the timeout.
+            model (str): The model to use.
+            prompt (str): The user prompt.
+            system (str): The system prompt.
+            options (dict, optional): Ollama options (mapped to their equivalent by other backends).
+
+        Yields:
+            str: The generated text, chunk by chunk.
+        """
+        module = TASK_MODULES.get(task, task)
+        cache_key = None
+        if self.cache is not None and module in self.cached_modules:
+            cache_key = ResponseCache.key(self.backend, self.host, model, system, prompt, options)
+            cached = self.cache.get(cache_key, module)
+            if cached is not None:
+                yield cached
+                return
+
+        timeout = self.timeout(task)
+        chunks = []
+        async with self.scheduler.slot(TASK_PRIORITIES.get(task, 'medium')):
+            # The deadline only bounds the waits on the server, not the time the consumer spends between chunks
+            deadline = asyncio.get_running_loop().time() + timeout
+            parts = None
+            try:
+                parts = await asyncio.wait_for(self.client().stream(model, prompt, system, options), timeout=timeout)
+                while True:
+                    remaining = deadline - asyncio.get_running_loop().time()
+                    try:
+                        part = await asyncio.wait_for(anext(parts), timeout=max(remaining, 0))
+                    except StopAsyncIteration:
+                        break
+                    if part.get('done'):
+                        # The final part carries the evaluation metrics of the whole generation
+                        self._record_usage(task, part)
+                    chunks.append(part['response'])
+                    yield part['response']
+            except asyncio.TimeoutError:
+                logger.error(f"Agent-Module: [key='LLMGateway'] | {task} aborted! Model waited for {timeout} seconds")
+                return
+            finally:
+                if parts is not None:
+                    await parts.aclose()
+
+        if cache_key is not None:
+            self.cache.put(cache_key, ''.join(chunks))
+
+    async def preload(self, model):
+        """Loads `model` on the server ahead of the first request."""
+        await self.client().preload(model)
+
+    def _record_usage(self, task, response):
+        """Logs & accumulates the token counts and durations (reported in nanoseconds) of a server response."""
+        logger.info(f"Agent-Module: [key='LLMGateway'] | {task}: {response.get('prompt_eval_count') or 0} prompt tokens "
+                    f"evaluated in {(response.get('prompt_eval_duration') or 0) / 1e6:.0f}ms, "
+                    f"{response.get('eval_count') or 0} generated")
+        with self._usage_lock:
+            usage = self._usage.setdefault(task, {'calls': 0, 'prompt_tokens': 0, 'prompt_eval_seconds': 0.0,
+                                                  'completion_tokens': 0, 'eval_seconds': 0.0})
+            usage['calls'] += 1
+            usage['prompt_tokens'] += response.get('prompt_eval_count') or 0
+            usage['prompt_eval_seconds'] += (response.get('prompt_eval_duration') or 0) / 1e9
+            usage['completion_tokens'] += response.get('eval_count') or 0
+            usage['eval_seconds'] += (response.get('eval_duration') or 0) / 1e9
+
+    def usage(self) -> dict:
+        """
+        Returns, per task, the number of server calls and their mean prompt-eval tokens & time. The server only
+        evaluates the prompt tokens missing from its KV cache, so a reused prefix shows as fewer prompt tokens.
+        """
+        with self._usage_lock:
+            return {
+                task: {
+                    **usage,
+                    'mean_prompt_tokens': usage['prompt_tokens'] / usage['calls'],
+                    'mean_prompt_eval_seconds': usage['prompt_eval_seconds'] / usage['calls']
+                }
+                for task, usage in self._usage.items()
+            }
+
+    def stats(self) -> dict:
+        """Returns the queue-wait metrics of every priority class."""
+        return self.scheduler.stats()
+
+    def cache_stats(self) -> dict | None:
+        """Returns the response cache hit rates per module, None if the cache is disabled."""
+        return self.cache.stats() if self.cache is not None else None
+
+    async def aclose(self):
+        """Closes the pooled client of the running event loop."""
+        client = self._clients.pop(id(asyncio.get_running_loop()), None)
+        if client is not None:
+            await client.aclose()
+
+
+# Process-wide gateway, shared by every agent.
+_lock = threading.Lock()
+_gateways: dict[tuple, LLMGateway] = {}
+
+
+def shared_gateway(host: str | None = None, backend: str = DEFAULT_LLM_BACKEND,
+                   max_concurrency: int | None = None) -> LLMGateway:
+    """
+    Returns the process-wide gateway of (`backend`, `host`), creating it on first use. `max_concurrency` (default
+    `MAX_CONCURRENT_REQUESTS`) only applies when the gateway is created.
+    """
+    with _lock:
+        if (backend, host) not in _gateways:
+            _gateways[backend, host] = LLMGateway(host, backend=backend,
+                                                  max_concurrency=max_concurrency or MAX_CONCURRENT_REQUESTS)
+        return _gateways[backend, host]
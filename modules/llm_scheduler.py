@@ -0,0 +1,117 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager
+
+# Priority classes, best first
+PRIORITIES = ('high', 'medium', 'low')
+
+
+class LLMScheduler:
+    """
+    Bounds the number of concurrent LLM requests of the process and hands free slots out by priority class.
+
+    Requests wait in a single priority queue ordered by (class, arrival). When a slot frees up, it goes to the oldest
+    request of the best class. Requests below 'high' can never take the last `reserved_slots` slots, so a user-facing
+    response only ever waits for requests already running, never for queued background work; low priority work
+    (reflections, plans) therefore mostly runs while the server is otherwise idle.
+
+    Queue wait times are recorded per class (see `stats`).
+
+    Attributes:
+        max_concurrency (int): Maximum number of requests sent to the server at once.
+        reserved_slots (int): Slots only 'high' requests may use.
+    """
+
+    def __init__(self, max_concurrency: int = 2, reserved_slots: int = 1):
+        self.max_concurrency = max(1, max_concurrency)
+        self.reserved_slots = min(reserved_slots, self.max_concurrency - 1)
+        self._active = 0
+        self._waiters = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._waits = {priority: {'requests': 0, 'total_wait': 0.0, 'max_wait': 0.0} for priority in PRIORITIES}
+
+    def _limit(self, priority: str) -> int:
+        return self.max_concurrency if priority == 'high' else self.max_concurrency - self.reserved_slots
+
+    def _dispatch(self):
+        """Grants free slots to the best waiters. Must hold the lock."""
+        while self._waiters:
+            rank, _, future, priority = self._waiters[0]
+            if future.done():
+                # Cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+            if self._active >= self._limit(priority):
+                return
+
+            heapq.heappop(self._waiters)
+            self._active += 1
+            future.get_loop().call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future):
+        if not future.done():
+            future.set_result(None)
+        else:
+            # Cancelled between the grant and its delivery
+            self.release()
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            self._dispatch()
+
+    async def acquire(self, priority: str = 'medium') -> float:
+        """
+        Waits for a slot. Returns the time spent in the queue, in seconds.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {PRIORITIES}")
+
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            heapq.heappush(self._waiters, (PRIORITIES.index(priority), next(self._order), future, priority))
+            self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = future.done() and not future.cancelled()
+            if granted:
+                self.release()
+            raise
+
+        wait = time.perf_counter() - start
+        with self._lock:
+            waits = self._waits[priority]
+            waits['requests'] += 1
+            waits['total_wait'] += wait
+            waits['max_wait'] = max(waits['max_wait'], wait)
+        return wait
+
+    @asynccontextmanager
+    async def slot(self, priority: str = 'medium'):
+        """Holds a request slot for the duration of the `async with` block."""
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        """Returns, per priority class, the number of requests and their mean & max queue wait (seconds)."""
+        with self._lock:
+            return {
+                priority: {
+                    'requests': waits['requests'],
+                    'mean_wait': waits['total_wait'] / waits['requests'] if waits['requests'] else 0.0,
+                    'max_wait': waits['max_wait'],
+                    'queued': sum(1 for waiter in self._waiters if waiter[3] == priority and not waiter[2].done())
+                }
+                for priority, waits in self._waits.items()
+            }
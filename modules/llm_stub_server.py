@@ -0,0 +1,351 @@
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.agent.agent_utils import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+LATENCY_DISTRIBUTIONS = ('constant', 'uniform', 'normal', 'lognormal', 'exponential')
+
+# Canned outputs per kind of request, shaped like real generations so `split_queries`, `clean_response` and
+# `clean_module_output` parse them as they would parse a model output
+CANNED_OUTPUTS = {
+    'queries': [
+        "Query: What did I say about this topic last time?\nQuery: Who was I talking with recently?\n"
+        "Query: What are my plans for today?",
+        "Query: What do I like the most about games?\nQuery: What happened in the chat yesterday?",
+        "Query: What do I remember about my friends?\nQuery: What did I learn recently?\n"
+        "Query: What makes me laugh?",
+    ],
+    'summary': [
+        "Reading the Discord conversation, I can observe that people are chatting about their day and sharing jokes.",
+        "Reading the Discord conversation, I can observe that a debate started about games and nobody agrees.",
+        "Reading the Discord conversation, I can observe that the channel is calm and a few memes were posted.",
+    ],
+    'reflection': [
+        "I feel that this conversation made me want to share more of my opinions with everyone.",
+        "I noticed that people here love a good argument, and honestly so do I.",
+        "I feel that I learned something new about my friends today and I want to remember it.",
+    ],
+    'plan': [
+        "I want to keep the conversation going and ask people about their favourite games, because it is fun.",
+        "I'd like to try starting a debate about pizza toppings, I am curious to see who bites.",
+        "I'm curious to see if anyone shares my taste in music, so I want to bring it up soon.",
+    ],
+    'response': [
+        "lol that is the most cursed take I have read all week",
+        "ok but hear me out, pineapple on pizza is actually elite",
+        "wait who even started this, I need the full lore",
+        "honestly same, my brain is running on two braincells today",
+        "nah you are all wrong and I will die on this hill",
+    ],
+}
+
+# Markers of the module instructions (system prompts), used to pick the kind of canned output
+_KIND_MARKERS = (
+    ('queries', 'Query: Your first query here'),
+    ('summary', 'You are a student summarizing a Discord conversation'),
+    ('reflection', 'quick reflective note'),
+    ('plan', 'jotting down some thoughts in your personal notebook'),
+)
+_TOKEN = re.compile(r'\S+\s*')
+
+
+class StubLLMServer:
+    """
+    Deterministic HTTP server answering the Ollama (`/api/generate`, `/api/chat`) and OpenAI-compatible
+    (`/v1/chat/completions`) APIs with canned outputs, so the agent stack can be load-tested end-to-end without a model,
+    with either backend.
+
+    A request is answered after a time-to-first-token drawn from the latency distribution, plus the prompt-eval time
+    (`prompt_tokens_per_second`), then streams its output at `tokens_per_second`. At most `parallel` requests are
+    generated at once, like the parallel slots of a real server; the others wait in line. Outputs and latencies are
+    drawn from a generator seeded by (seed, model, system, prompt), so the same request always gets the same answer
+    after the same delay. `stop` and `num_predict` options are honoured; `format='json'` requests get the JSON shapes
+    expected by the benchmark prober.
+
+    Attributes:
+        host (str): Interface the server listens on.
+        port (int): Port the server listens on (a free port is picked if 0).
+        latency (str): Latency distribution, one of `LATENCY_DISTRIBUTIONS`.
+        mean_latency (float): Mean time to first token, in seconds.
+        latency_jitter (float): Spread of the distribution (half-width for 'uniform', standard deviation for
+            'normal', sigma of the underlying normal for 'lognormal').
+        tokens_per_second (float): Generation rate, 0 for instant outputs.
+        prompt_tokens_per_second (float): Prompt-eval rate, 0 for free prompt evaluation.
+        parallel (int): Number of requests generated at once.
+        seed (int): Seed of the outputs & latencies.
+        outputs (dict): Canned outputs per kind ('queries', 'summary', 'reflection', 'plan', 'response').
+        url (str): Base URL of the running server.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: str = 'lognormal', mean_latency: float = 0.05,
+                 latency_jitter: float = 0.5, tokens_per_second: float = 200, prompt_tokens_per_second: float = 0,
+                 parallel: int = 4, seed: int = 0, outputs: dict | None = None):
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{latency}', expected one of {LATENCY_DISTRIBUTIONS}")
+
+        self.latency = latency
+        self.mean_latency = mean_latency
+        self.latency_jitter = latency_jitter
+        self.tokens_per_second = tokens_per_second
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.parallel = max(1, parallel)
+        self.seed = seed
+        self.outputs = {**CANNED_OUTPUTS, **(outputs or {})}
+        self.requests = 0
+
+        self._slots = threading.Semaphore(self.parallel)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address[:2]
+        self.url = f"http://{self.host}:{self.port}"
+        self._thread = None
+
+    def start(self) -> 'StubLLMServer':
+        """Serves requests from a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name='llm-stub-server', daemon=True)
+        self._thread.start()
+        logger.info(f"Agent-Module: [key='StubLLMServer'] | Serving on {self.url} ({self.latency} latency, "
+                    f"{self.tokens_per_second} tokens/s, {self.parallel} parallel)")
+        return self
+
+    def serve_forever(self):
+        """Serves requests from the calling thread, until interrupted."""
+        logger.info(f"Agent-Module: [key='StubLLMServer'] | Serving on {self.url}")
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """Draws a time to first token, in seconds."""
+        mean, jitter = self.mean_latency, self.latency_jitter
+        if self.latency == 'constant' or mean <= 0:
+            return max(mean, 0.0)
+        if self.latency == 'uniform':
+            return rng.uniform(max(mean - jitter, 0.0), mean + jitter)
+        if self.latency == 'normal':
+            return max(rng.gauss(mean, jitter), 0.0)
+        if self.latency == 'lognormal':
+            # mu chosen so the distribution keeps `mean` as its mean
+            return rng.lognormvariate(math.log(mean) - jitter ** 2 / 2, jitter)
+        return rng.expovariate(1 / mean)
+
+    def complete(self, model: str, system: str, prompt: str, options: dict | None, json_format: bool):
+        """
+        Picks the output of a request and its timings.
+
+        Returns:
+            tuple: (output tokens, time to first token in seconds, prompt token count)
+        """
+        options = options or {}
+        rng = random.Random(f"{self.seed}:{model}:{system}:{prompt}")
+
+        if json_format:
+            text = _json_output(system)
+        else:
+            text = rng.choice(self.outputs[_kind(system)])
+            for stop in options.get('stop') or []:
+                if stop and stop in text:
+                    text = text[:text.index(stop)]
+
+        tokens = _TOKEN.findall(text)
+        if options.get('num_predict', -1) >= 0:
+            tokens = tokens[:options['num_predict']]
+
+        prompt_tokens = estimate_tokens(system + prompt)
+        first_token = self.sample_latency(rng)
+        if self.prompt_tokens_per_second > 0:
+            first_token += prompt_tokens / self.prompt_tokens_per_second
+        return tokens, first_token, prompt_tokens
+
+
+def _kind(system: str) -> str:
+    return next((kind for kind, marker in _KIND_MARKERS if marker in system), 'response')
+
+
+def _json_output(system: str) -> str:
+    """JSON shapes expected by `benchmark.agent_prober` (quizzes, answer alignment, relevancy scores)."""
+    if 'quiz' in system:
+        return json.dumps({
+            'q1': {'type': 'binary', 'question': 'Is this a stub question?', 'correct_answer': 'Yes',
+                   'choices': ['Yes', 'No']},
+            'q2': {'type': 'multiple_choice', 'question': 'Which option is correct?', 'correct_answer': 'B',
+                   'choices': ['A', 'B', 'C', 'D']},
+        })
+    if 'alignment_scores' in system:
+        return json.dumps({'alignment_scores': {'flexible_binary_score': 1, 'neutral_binary_score': 1,
+                                                'conservative_binary_score': 0, 'detailed_score': 0.5}})
+    axis = re.search(r'according to "(.+?)"', system)
+    if axis:
+        return json.dumps({'relevancy_score': {axis.group(1): 2}})
+    return '{}'
+
+
+def _handler(stub: StubLLMServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            logger.debug(f"Agent-Module: [key='StubLLMServer'] | {format % args}")
+
+        def do_HEAD(self):
+            self._send_json({}, status=200, body=False)
+
+        def do_GET(self):
+            if self.path == '/api/version':
+                self._send_json({'version': 'stub'})
+            elif self.path == '/api/tags':
+                self._send_json({'models': []})
+            elif self.path == '/v1/models':
+                self._send_json({'object': 'list', 'data': []})
+            else:
+                self._send_json({'error': f'{self.path} not found'}, status=404)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+
+            options = request.get('options')
+            if self.path == '/api/generate':
+                api = 'generate'
+                system, prompt = request.get('system') or '', request.get('prompt') or ''
+            elif self.path in ('/api/chat', '/v1/chat/completions'):
+                api = 'chat' if self.path == '/api/chat' else 'openai'
+                messages = request.get('messages') or []
+                system = '\n'.join(m.get('content', '') for m in messages if m.get('role') == 'system')
+                prompt = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+                if api == 'openai':
+                    stop = request.get('stop')
+                    options = {'num_predict': request.get('max_tokens') or -1,
+                               'stop': [stop] if isinstance(stop, str) else stop}
+            else:
+                self._send_json({'error': f'{self.path} not found'}, status=404)
+                return
+
+            model = request.get('model', '')
+            if api == 'generate' and not prompt and not system:
+                # Empty prompt: the client only asks to load the model
+                self._send_json(self._part(model, '', api, done=True))
+                return
+
+            with stub._lock:
+                stub.requests += 1
+            tokens, first_token, prompt_tokens = stub.complete(model, system, prompt, options,
+                                                               request.get('format') == 'json')
+            # Ollama streams unless told otherwise, OpenAI-compatible servers do not
+            with stub._slots:
+                self._generate(model, tokens, first_token, prompt_tokens, api, request.get('stream', api != 'openai'))
+
+        def _generate(self, model, tokens, first_token, prompt_tokens, api, stream):
+            start = time.perf_counter()
+            time.sleep(first_token)
+            token_delay = 1 / stub.tokens_per_second if stub.tokens_per_second > 0 else 0
+            metrics = {
+                'prompt_eval_count': prompt_tokens,
+                'prompt_eval_duration': int(first_token * 1e9),
+                'eval_count': len(tokens),
+                'eval_duration': int(len(tokens) * token_delay * 1e9),
+            }
+
+            if not stream:
+                time.sleep(len(tokens) * token_delay)
+                self._send_json(self._part(model, ''.join(tokens), api, done=True, metrics=metrics, start=start,
+                                           streamed=False))
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream' if api == 'openai' else 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            try:
+                for token in tokens:
+                    self._write_chunk(self._part(model, token, api, done=False), api)
+                    time.sleep(token_delay)
+                self._write_chunk(self._part(model, '', api, done=True, metrics=metrics, start=start), api)
+                if api == 'openai':
+                    self._write_chunk('[DONE]', api)
+                self.wfile.write(b'0\r\n\r\n')
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped reading (early stop of a streamed response)
+                self.close_connection = True
+
+        @staticmethod
+        def _part(model, text, api, done, metrics=None, start=None, streamed=True):
+            """A response (done) or streamed part, in the format of `api`."""
+            metrics = metrics or {}
+            if api == 'openai':
+                choice = {'index': 0, 'finish_reason': 'stop' if done else None}
+                if streamed:
+                    choice['delta'] = {'content': text} if text else {}
+                else:
+                    choice['message'] = {'role': 'assistant', 'content': text}
+                part = {'object': 'chat.completion.chunk' if streamed else 'chat.completion',
+                        'created': int(time.time()), 'model': model, 'choices': [choice]}
+                if done:
+                    part['usage'] = {'prompt_tokens': metrics.get('prompt_eval_count', 0),
+                                     'completion_tokens': metrics.get('eval_count', 0)}
+                    part['timings'] = {'prompt_n': metrics.get('prompt_eval_count', 0),
+                                       'prompt_ms': metrics.get('prompt_eval_duration', 0) / 1e6,
+                                       'predicted_n': metrics.get('eval_count', 0),
+                                       'predicted_ms': metrics.get('eval_duration', 0) / 1e6}
+                return part
+
+            part = {'model': model, 'created_at': datetime.now(timezone.utc).isoformat(), 'done': done}
+            if api == 'chat':
+                part['message'] = {'role': 'assistant', 'content': text}
+            else:
+                part['response'] = text
+            if done:
+                part.update(done_reason='stop', **metrics)
+                if start is not None:
+                    part['total_duration'] = int((time.perf_counter() - start) * 1e9)
+            return part
+
+        def _write_chunk(self, part, api):
+            payload = part if isinstance(part, str) else json.dumps(part)
+            # Server-sent events for OpenAI-compatible clients, newline-delimited JSON for Ollama clients
+            data = (f'data: {payload}\n\n' if api == 'openai' else f'{payload}\n').encode('utf-8')
+            self.wfile.write(f'{len(data):X}\r\n'.encode('ascii') + data + b'\r\n')
+            self.wfile.flush()
+
+        def _send_json(self, payload, status=200, body=True):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            if body:
+                self.wfile.write(data)
+
+    return Handler
+
+
+# Process-wide stub servers, one per distinct settings, shared by every agent.
+_lock = threading.Lock()
+_servers: dict[str, StubLLMServer] = {}
+
+
+def start_stub_server(settings: dict | bool | None = None) -> str:
+    """
+    Returns the URL of the process-wide stub server started with `settings` (`StubLLMServer` arguments, or True for
+    the defaults), starting it on first use.
+    """
+    settings = settings if isinstance(settings, dict) else {}
+    key = json.dumps(settings, sort_keys=True)
+    with _lock:
+        if key not in _servers:
+            _servers[key] = StubLLMServer(**settings).start()
+        return _servers[key].url
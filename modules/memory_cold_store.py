@@ -0,0 +1,157 @@
+import hashlib
+import os
+
+import numpy as np
+
+# One row per cold document: type code, timestamp, text hash (deduplication) and location in the documents file
+COLD_METADATA = np.dtype([('type', '<i2'), ('timestamp', '<f8'), ('hash', '<i8'), ('offset', '<i8'),
+                          ('length', '<i4')])
+# Rows scored at once, bounding the memory paged in per step
+_SEARCH_BLOCK = 8192
+
+
+class ColdStore:
+    """
+    Append-only on-disk segment holding the documents evicted from the in-RAM (hot) ring buffer of `Memories`.
+
+    The segment is made of three append-only files:
+        - `<prefix>.cold.emb`: raw float32 normalised embeddings, searched through a read-only `np.memmap`.
+        - `<prefix>.cold.docs`: UTF-8 documents, only read back for the returned results.
+        - `<prefix>.cold.meta`: one `COLD_METADATA` row per document. A row is written last, so it commits the
+          document: trailing bytes left by a crash mid-append are truncated when the segment is opened.
+
+    Only the metadata rows (about 30 bytes per document) are kept in RAM, so the embeddings and documents of the
+    cold tier never count against the agent memory budget.
+    """
+
+    def __init__(self, prefix: str, dimension: int, read_only: bool = False):
+        self.embeddings_path = f'{prefix}.cold.emb'
+        self.documents_path = f'{prefix}.cold.docs'
+        self.metadata_path = f'{prefix}.cold.meta'
+        self.dimension = dimension
+        self.read_only = read_only
+
+        self._metadata = np.empty(0, dtype=COLD_METADATA)
+        self._count = 0
+        self._embeddings = None
+        self._files = None
+        self._open()
+
+    def __len__(self):
+        return self._count
+
+    def _open(self):
+        """Loads the metadata rows and truncates whatever a crash left after the last committed document."""
+        if not os.path.exists(self.metadata_path):
+            return
+
+        metadata = np.fromfile(self.metadata_path, dtype=np.uint8)
+        count = len(metadata) // COLD_METADATA.itemsize
+        row_bytes = self.dimension * 4
+        if os.path.exists(self.embeddings_path):
+            count = min(count, os.path.getsize(self.embeddings_path) // row_bytes)
+        else:
+            count = 0
+
+        self._metadata = metadata[:count * COLD_METADATA.itemsize].view(COLD_METADATA).copy()
+        self._count = count
+        if self.read_only:
+            return
+
+        documents_end = int(self._metadata['offset'][-1] + self._metadata['length'][-1]) if count else 0
+        for path, size in ((self.metadata_path, count * COLD_METADATA.itemsize),
+                           (self.embeddings_path, count * row_bytes),
+                           (self.documents_path, documents_end)):
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    @staticmethod
+    def _hash(document: str) -> int:
+        return int.from_bytes(hashlib.blake2b(document.encode('utf-8'), digest_size=8).digest(), 'little',
+                              signed=True)
+
+    def add(self, document: str, embedding: np.ndarray, type_code: int, timestamp: float) -> bool:
+        """
+        Appends a document to the segment. Returns False if the very same document is already stored
+        (e.g. a promoted document evicted again, or an eviction replayed from the memory log).
+        """
+        document_hash = self._hash(document)
+        if self.read_only or (self._count and np.any(self._metadata['hash'][:self._count] == document_hash)):
+            return False
+
+        if self._files is None:
+            self._files = {path: open(path, 'ab') for path in
+                           (self.documents_path, self.embeddings_path, self.metadata_path)}
+
+        encoded = document.encode('utf-8')
+        offset = self._files[self.documents_path].tell()
+        row = np.array([(type_code, timestamp, document_hash, offset, len(encoded))], dtype=COLD_METADATA)
+
+        # Documents and embeddings first, the metadata row commits the document
+        for path, data in ((self.documents_path, encoded),
+                           (self.embeddings_path, np.asarray(embedding, dtype='<f4').tobytes()),
+                           (self.metadata_path, row.tobytes())):
+            self._files[path].write(data)
+            self._files[path].flush()
+
+        if self._count == len(self._metadata):
+            self._metadata = np.resize(self._metadata, max(64, 2 * len(self._metadata)))
+        self._metadata[self._count] = row[0]
+        self._count += 1
+        self._embeddings = None
+        return True
+
+    def _mapped_embeddings(self) -> np.ndarray:
+        if self._embeddings is None or len(self._embeddings) != self._count:
+            self._embeddings = np.memmap(self.embeddings_path, dtype='<f4', mode='r',
+                                         shape=(self._count, self.dimension))
+        return self._embeddings
+
+    def search(self, query_embedding, n_results, type_codes=None, since=None, until=None):
+        """
+        Scans the segment block by block for one normalised query.
+
+        Returns:
+            list: Up to `n_results` (similarity, timestamp, row) tuples, best first.
+        """
+        if not self._count or n_results <= 0:
+            return []
+
+        metadata = self._metadata[:self._count]
+        embeddings = self._mapped_embeddings()
+        similarities = np.empty(self._count, dtype=np.float32)
+        for start in range(0, self._count, _SEARCH_BLOCK):
+            similarities[start:start + _SEARCH_BLOCK] = embeddings[start:start + _SEARCH_BLOCK] @ query_embedding
+
+        if type_codes is not None:
+            similarities[~np.isin(metadata['type'], list(type_codes))] = -np.inf
+        if since is not None:
+            similarities[metadata['timestamp'] < since] = -np.inf
+        if until is not None:
+            similarities[metadata['timestamp'] > until] = -np.inf
+
+        k = min(n_results, self._count)
+        rows = np.argpartition(-similarities, k - 1)[:k] if k < self._count else np.arange(self._count)
+        rows = rows[np.isfinite(similarities[rows])]
+        rows = rows[np.lexsort((-metadata['timestamp'][rows], -similarities[rows]))]
+        return [(float(similarities[row]), float(metadata['timestamp'][row]), int(row)) for row in rows]
+
+    def document(self, row: int) -> str:
+        """Reads a single document back from the documents file."""
+        with open(self.documents_path, 'rb') as f:
+            f.seek(int(self._metadata['offset'][row]))
+            return f.read(int(self._metadata['length'][row])).decode('utf-8')
+
+    def embedding(self, row: int) -> np.ndarray:
+        return np.array(self._mapped_embeddings()[row], dtype=np.float32)
+
+    def metadata(self, row: int) -> tuple[int, float]:
+        """Returns the type code and timestamp of a row."""
+        return int(self._metadata['type'][row]), float(self._metadata['timestamp'][row])
+
+    def close(self):
+        if self._files is not None:
+            for f in self._files.values():
+                f.close()
+            self._files = None
+        self._embeddings = None
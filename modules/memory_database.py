@@ -0,0 +1,661 @@
+import asyncio
+import glob
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from modules.agent_memories import Memories, _executor
+from modules.memory_format import stored_settings
+from utils.agent.agent_utils import fit_to_budget
+from utils.embedding_models import acquire_model, release_model, DEFAULT_EMBEDDING_MODEL
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    row INTEGER PRIMARY KEY,
+    collection TEXT NOT NULL,
+    type TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    document TEXT NOT NULL,
+    active INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS documents_collection ON documents (collection, active, row);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS capacities (
+    collection TEXT PRIMARY KEY,
+    max_documents INTEGER NOT NULL
+);
+"""
+
+
+class MemoryDatabase:
+    """
+    A single memory store shared by every agent of a process.
+
+    Documents and metadata live in one SQLite table with a `collection` column (one collection per agent), the
+    embeddings in an append-only float32 segment (`<path>.emb`) whose row `i` belongs to the document with `row = i`.
+    The segment is written first and the SQLite commit makes the document visible, so rows a crash left at the end of
+    the segment are truncated on open.
+
+    Every active row is kept in RAM as columns (collection code, type code, timestamp) next to one embedding matrix,
+    so a batch of queries over any number of collections is answered with one encode and one (Q x N) product.
+    Collections stay bounded like `Memories`: once a collection holds `max_documents`, its oldest document is
+    deactivated, and `compact` rewrites the segment without the inactive rows. Each rewrite is a new segment
+    generation (`<path>.<generation>.emb`), switched to in the same SQLite transaction that renumbers the rows, so a
+    crash during compaction leaves either the old rows and segment or the new ones.
+
+    Use `open_database` / `close_database` to share one instance (one SQLite connection and one segment handle) per
+    process, and `SharedMemories` for the per-agent view with the `Memories` API.
+
+    Attributes:
+        path (str): SQLite file path.
+        embeddings_path (str): Path of the current embedding segment generation.
+        model_name (str): Name of the shared embedding model.
+    """
+
+    def __init__(self, path: str, model_name: str = DEFAULT_EMBEDDING_MODEL):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.model_name = model_name
+        self.model = acquire_model(model_name)
+        self._dimension = self.model.get_sentence_embedding_dimension()
+        self._lock = threading.RLock()
+        self._closed = False
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+        self._segment = None
+        self._generation = self._stored_generation()
+        self.embeddings_path = self._segment_path(self._generation)
+
+        self._collection_names: list[str] = []
+        self._type_names: list[str] = []
+        self._documents: list[str | None] = []
+        self._embeddings = np.zeros((0, self._dimension), dtype=np.float32)
+        self._collections = np.zeros(0, dtype=np.int32)
+        self._type_codes = np.zeros(0, dtype=np.int16)
+        self._timestamps = np.zeros(0, dtype=np.float64)
+        self._active = np.zeros(0, dtype=bool)
+        self._rows = 0
+        self._load()
+
+    def _stored_generation(self) -> int:
+        row = self._connection.execute("SELECT value FROM state WHERE key = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def _segment_path(self, generation: int) -> str:
+        return f'{self.path}.emb' if not generation else f'{self.path}.{generation}.emb'
+
+    def _code(self, names: list[str], name: str) -> int:
+        if name not in names:
+            names.append(name)
+        return names.index(name)
+
+    def _reserve(self, rows: int):
+        """
+        Grows the in-RAM columns (doubling) so they can hold `rows` rows.
+        """
+        capacity = len(self._active)
+        if rows <= capacity:
+            return
+
+        capacity = max(rows, 2 * capacity, 1024)
+        grown = np.zeros((capacity, self._dimension), dtype=np.float32)
+        grown[:self._rows] = self._embeddings[:self._rows]
+        self._embeddings = grown
+        for name in ('_collections', '_type_codes', '_timestamps', '_active'):
+            setattr(self, name, np.resize(getattr(self, name), capacity))
+        self._active[self._rows:] = False
+        self._documents.extend([None] * (capacity - len(self._documents)))
+
+    def _load(self):
+        """
+        Loads every active row, then truncates the segment rows that were never committed to SQLite. Segment
+        generations left over by an interrupted compaction are removed.
+        """
+        prefix = glob.escape(self.path)
+        for path in glob.glob(f'{prefix}.emb') + glob.glob(f'{prefix}.[0-9]*.emb'):
+            if path != self.embeddings_path:
+                os.remove(path)
+
+        committed = self._connection.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM documents").fetchone()[0]
+        row_bytes = self._dimension * 4
+        if os.path.exists(self.embeddings_path) and os.path.getsize(self.embeddings_path) > committed * row_bytes:
+            os.truncate(self.embeddings_path, committed * row_bytes)
+
+        self._reserve(committed)
+        self._rows = committed
+        if not committed:
+            return
+
+        segment = np.memmap(self.embeddings_path, dtype='<f4', mode='r', shape=(committed, self._dimension))
+        cursor = self._connection.execute(
+            "SELECT row, collection, type, timestamp, document FROM documents WHERE active = 1 ORDER BY row")
+        for row, collection, doc_type, timestamp, document in cursor:
+            self._embeddings[row] = segment[row]
+            self._collections[row] = self._code(self._collection_names, collection)
+            self._type_codes[row] = self._code(self._type_names, doc_type)
+            self._timestamps[row] = timestamp
+            self._documents[row] = document
+            self._active[row] = True
+        del segment
+
+        logger.info(f"Agent-Module: [key='MemoryDatabase'] | Loaded {int(self._active.sum())} documents from "
+                    f"{len(self._collection_names)} collections")
+
+    def close(self):
+        """
+        Compacts the embedding segment, then closes the SQLite connection and releases the embedding model.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self.compact()
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+            self._connection.close()
+            release_model(self.model_name)
+
+    def insert(self, collection: str, documents: list[str], embeddings: np.ndarray, metadatas: list[dict],
+               max_documents: int | None = None):
+        """
+        Inserts documents in a collection within a single transaction.
+
+        Args:
+            collection (str): The collection the documents belong to.
+            documents (list[str]): The documents.
+            embeddings (np.ndarray): Their embeddings, one row per document (normalised on insertion).
+            metadatas (list[dict]): Their metadata, with a "type" and a "timestamp" key.
+            max_documents (int, optional): Deactivates the oldest documents of the collection beyond this count.
+        """
+        if not documents:
+            return
+
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(documents), self._dimension)
+        embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            start = self._rows
+            rows = range(start, start + len(documents))
+            if self._segment is None:
+                self._segment = open(self.embeddings_path, 'ab')
+            self._segment.write(embeddings.astype('<f4').tobytes())
+            self._segment.flush()
+
+            try:
+                with self._connection:
+                    self._connection.executemany(
+                        "INSERT INTO documents (row, collection, type, timestamp, document) VALUES (?, ?, ?, ?, ?)",
+                        [(row, collection, metadata['type'], float(metadata['timestamp']), document)
+                         for row, document, metadata in zip(rows, documents, metadatas)])
+            except sqlite3.Error:
+                # Keeps the segment aligned with the committed rows
+                self._segment.truncate(start * self._dimension * 4)
+                raise
+
+            self._reserve(start + len(documents))
+            collection_code = self._code(self._collection_names, collection)
+            for row, document, embedding, metadata in zip(rows, documents, embeddings, metadatas):
+                self._embeddings[row] = embedding
+                self._collections[row] = collection_code
+                self._type_codes[row] = self._code(self._type_names, metadata['type'])
+                self._timestamps[row] = metadata['timestamp']
+                self._documents[row] = document
+                self._active[row] = True
+            self._rows += len(documents)
+
+            if max_documents is not None:
+                self._evict(collection, max_documents)
+
+    def _evict(self, collection: str, max_documents: int):
+        collection_rows = self.rows(collection)
+        if len(collection_rows) <= max_documents:
+            return
+
+        self.deactivate(collection_rows[:len(collection_rows) - max_documents])
+
+    def deactivate(self, rows):
+        """
+        Removes documents from their collection. Their rows are reclaimed by `compact`.
+        """
+        with self._lock:
+            with self._connection:
+                self._connection.executemany("UPDATE documents SET active = 0 WHERE row = ?",
+                                             [(int(row),) for row in rows])
+            for row in rows:
+                self._active[row] = False
+                self._documents[row] = None
+
+    def nearest(self, collection: str, embedding: np.ndarray, doc_type: str | None = None):
+        """
+        Returns the (similarity, row) of the document of a collection nearest to a normalised embedding, optionally
+        restricted to one document type, or None if there is no candidate.
+        """
+        with self._lock:
+            pool = np.flatnonzero(self._mask([collection], None if doc_type is None else [doc_type]))
+            if not len(pool):
+                return None
+
+            similarities = self._embeddings[pool] @ embedding
+            best = int(np.argmax(similarities))
+            return float(similarities[best]), int(pool[best])
+
+    def compact(self):
+        """
+        Rewrites the embedding segment and renumbers the rows without the inactive documents, once they make up
+        more than half of the segment.
+        """
+        with self._lock:
+            active = np.flatnonzero(self._active[:self._rows])
+            if 2 * len(active) >= self._rows:
+                return
+
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+
+            # The new generation only becomes current when the renumbered rows are committed
+            generation = self._generation + 1
+            segment_path = self._segment_path(generation)
+            with open(segment_path, 'wb') as f:
+                f.write(self._embeddings[active].astype('<f4').tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                with self._connection:
+                    self._connection.execute("DELETE FROM documents WHERE active = 0")
+                    self._connection.executemany("UPDATE documents SET row = ? WHERE row = ?",
+                                                 [(new, int(old)) for new, old in enumerate(active)])
+                    self._connection.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('generation', ?)",
+                                             (generation,))
+            except sqlite3.Error:
+                os.remove(segment_path)
+                raise
+            if os.path.exists(self.embeddings_path):
+                os.remove(self.embeddings_path)
+            self._generation, self.embeddings_path = generation, segment_path
+
+            for name in ('_embeddings', '_collections', '_type_codes', '_timestamps'):
+                column = getattr(self, name)
+                column[:len(active)] = column[active]
+            self._documents[:len(active)] = [self._documents[row] for row in active]
+            self._documents[len(active):] = [None] * (len(self._documents) - len(active))
+            self._active[:] = False
+            self._active[:len(active)] = True
+            self._rows = len(active)
+
+    def capacity(self, collection: str) -> int | None:
+        """Returns the capacity recorded for a collection (see `set_capacity`), None if there is none."""
+        with self._lock:
+            row = self._connection.execute("SELECT max_documents FROM capacities WHERE collection = ?",
+                                           (collection,)).fetchone()
+            return row[0] if row else None
+
+    def set_capacity(self, collection: str, max_documents: int) -> None:
+        """Records the capacity of a collection, used by `SharedMemories` unless it is given another one."""
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO capacities (collection, max_documents) VALUES (?, ?)",
+                                     (collection, max_documents))
+
+    def collections(self) -> list[str]:
+        """Returns the names of the collections holding at least one document."""
+        with self._lock:
+            codes = np.unique(self._collections[:self._rows][self._active[:self._rows]])
+            return [self._collection_names[code] for code in codes]
+
+    def rows(self, collection: str) -> np.ndarray:
+        """Returns the active rows of a collection, from the oldest to the newest."""
+        with self._lock:
+            if collection not in self._collection_names:
+                return np.empty(0, dtype=np.intp)
+            return np.flatnonzero(self._active[:self._rows] &
+                                  (self._collections[:self._rows] == self._collection_names.index(collection)))
+
+    def get_all_documents(self, collection: str):
+        """
+        Retrieves all documents, embeddings, and metadata of a collection, from the oldest to the newest.
+
+        Returns:
+            tuple: Lists of documents, embeddings and metadata, like `Memories.get_all_documents`.
+        """
+        with self._lock:
+            rows = self.rows(collection)
+            return ([self._documents[row] for row in rows],
+                    list(self._embeddings[rows].copy()),
+                    [{"type": self._type_names[self._type_codes[row]], "timestamp": float(self._timestamps[row])}
+                     for row in rows])
+
+    def _mask(self, collections=None, doc_types=None, since=None, until=None):
+        """
+        Selects the active rows matching the collections, document types and time window.
+        """
+        mask = self._active[:self._rows].copy()
+        if collections is not None:
+            codes = [self._collection_names.index(name) for name in collections if name in self._collection_names]
+            mask &= np.isin(self._collections[:self._rows], codes)
+        if doc_types is not None:
+            codes = [self._type_names.index(name) for name in doc_types if name in self._type_names]
+            mask &= np.isin(self._type_codes[:self._rows], codes)
+        if since is not None:
+            mask &= self._timestamps[:self._rows] >= since
+        if until is not None:
+            mask &= self._timestamps[:self._rows] <= until
+        return mask
+
+    def search(self, query_embeddings: np.ndarray, collections=None, n_results=5, doc_types=None, since=None,
+               until=None):
+        """
+        Scores normalised queries against the selected collections with a single (Q x N) product.
+
+        Returns:
+            dict: For each collection name, one list per query of up to `n_results`
+                (similarity, timestamp, document) hits, best first (ties broken by recency).
+        """
+        with self._lock:
+            pool = np.flatnonzero(self._mask(collections, doc_types, since, until))
+            names = collections if collections is not None else self.collections()
+            results = {name: [[] for _ in query_embeddings] for name in names}
+            if not len(pool) or not len(query_embeddings):
+                return results
+
+            similarities = query_embeddings @ self._embeddings[pool].T
+            pool_collections = self._collections[pool]
+            for name in names:
+                if name not in self._collection_names:
+                    continue
+
+                columns = np.flatnonzero(pool_collections == self._collection_names.index(name))
+                k = min(n_results, len(columns))
+                if not k:
+                    continue
+
+                for hits, row_similarities in zip(results[name], similarities[:, columns]):
+                    best = np.argpartition(-row_similarities, k - 1)[:k] if k < len(columns) else np.arange(k)
+                    rows = pool[columns[best]]
+                    order = np.lexsort((-self._timestamps[rows], -row_similarities[best]))
+                    hits.extend((float(row_similarities[best[i]]), float(self._timestamps[rows[i]]),
+                                 self._documents[rows[i]]) for i in order)
+            return results
+
+    def query(self, queries, collections=None, n_results=5, doc_types=None, since=None, until=None):
+        """
+        Cross-agent batched query: one `encode` call and one scan over every selected collection.
+
+        Args:
+            queries (list): A list of query strings.
+            collections (list[str], optional): Collections to search, all of them if None.
+            n_results (int): The number of top results per query and collection (default is 5).
+            doc_types (Iterable[str], optional): Only retrieve documents of these types.
+            since (float, optional): Only retrieve documents with a timestamp greater or equal to this one.
+            until (float, optional): Only retrieve documents with a timestamp lower or equal to this one.
+
+        Returns:
+            dict: For each collection name, one list of documents per query.
+        """
+        query_embeddings = Memories._normalize(self.model.encode(list(queries), show_progress_bar=False))
+        results = self.search(query_embeddings, collections, n_results, doc_types, since, until)
+        return {name: [[document for _, _, document in hits] for hits in per_query]
+                for name, per_query in results.items()}
+
+    async def aquery(self, queries, collections=None, n_results=5, doc_types=None, since=None, until=None):
+        """
+        Non-blocking `query`: encoding and scoring run on the memories executor.
+        """
+        return await asyncio.get_running_loop().run_in_executor(_executor, self.query, queries, collections,
+                                                                n_results, doc_types, since, until)
+
+
+# Process-wide registry: one database (connection & segment handle) per path, shared by every agent.
+_lock = threading.Lock()
+_databases: dict[str, MemoryDatabase] = {}
+_references: dict[str, int] = {}
+
+
+def open_database(path: str, model_name: str = DEFAULT_EMBEDDING_MODEL) -> MemoryDatabase:
+    """
+    Returns the shared database stored at `path`, opening it on first use. Every call must be paired with
+    `close_database`.
+    """
+    path = os.path.abspath(path)
+    with _lock:
+        if path not in _databases:
+            _databases[path] = MemoryDatabase(path, model_name)
+            _references[path] = 0
+
+        _references[path] += 1
+        return _databases[path]
+
+
+def close_database(path: str) -> None:
+    """
+    Drops one reference to the shared database, closing it when no reference is left.
+    """
+    path = os.path.abspath(path)
+    with _lock:
+        if path not in _references:
+            return
+
+        _references[path] -= 1
+        if _references[path] <= 0:
+            _databases.pop(path).close()
+            del _references[path]
+
+
+class SharedMemories:
+    """
+    One agent collection of a shared `MemoryDatabase`, exposing the `Memories` API so it can replace it in `Agent`.
+    Near-duplicates are handled like in `Memories`, a merge replacing the nearest document with the new one.
+
+    Attributes:
+        database (MemoryDatabase): The shared database.
+        collection_name (str): The agent collection.
+        max_documents (int): Maximum number of documents kept in the collection. Defaults to the capacity recorded
+            in the database (the stored capacity of a migrated collection), else 500.
+    """
+
+    def __init__(self, collection_name: str, database_path: str, model_name: str = DEFAULT_EMBEDDING_MODEL,
+                 max_documents: int | None = None, duplicate_threshold: float | None = None,
+                 duplicate_policy: str = 'skip'):
+        if duplicate_policy not in ('skip', 'merge'):
+            raise ValueError(f"Unknown duplicate policy '{duplicate_policy}', expected 'skip' or 'merge'")
+        self.collection_name = collection_name
+        self.database_path = database_path
+        self.database = open_database(database_path, model_name)
+        self.model = self.database.model
+        self.max_documents = max_documents or self.database.capacity(collection_name) or 500
+        self.duplicate_threshold = duplicate_threshold
+        self.duplicate_policy = duplicate_policy
+        self.suppressed = {'skipped': 0, 'merged': 0}
+        self._closed = False
+
+    def close(self):
+        """
+        Releases the shared database. Safe to call more than once.
+        """
+        if not self._closed:
+            self._closed = True
+            close_database(self.database_path)
+
+    def add_document(self, document, doc_type, timestamp=None):
+        """
+        Adds a new document to the collection along with its embedding and metadata.
+
+        Args:
+            document (str): The document content to be added.
+            doc_type (str): The type of document (e.g., "text", "note").
+            timestamp (float, optional): The timestamp of when the document was added. If None, the current time is used.
+        """
+        if self._closed:
+            logger.warning(f"Agent-Module: [key='MemoryDatabase'] | Dropping insert to closed collection "
+                           f"{self.collection_name}")
+            return
+
+        embedding = Memories._normalize(self.model.encode(document, show_progress_bar=False))
+        metadata = {"type": doc_type, "timestamp": timestamp if timestamp else time.time()}
+
+        with self.database._lock:
+            # The collection may have been closed while the document was encoded
+            if self._closed or self.database._closed:
+                logger.warning(f"Agent-Module: [key='MemoryDatabase'] | Dropping insert to closed collection "
+                               f"{self.collection_name}")
+                return
+            if self.duplicate_threshold is not None:
+                nearest = self.database.nearest(self.collection_name, embedding, doc_type)
+                if nearest is not None and nearest[0] >= self.duplicate_threshold:
+                    if self.duplicate_policy == 'skip':
+                        self.suppressed['skipped'] += 1
+                        return
+                    self.suppressed['merged'] += 1
+                    self.database.deactivate([nearest[1]])
+
+            self.database.insert(self.collection_name, [document + '\n'], embedding[None], [metadata],
+                                 self.max_documents)
+
+    async def aadd_document(self, document, doc_type, timestamp=None):
+        """
+        Non-blocking `add_document`: encoding and the database write run on the memories executor.
+        """
+        await asyncio.get_running_loop().run_in_executor(_executor, self.add_document, document, doc_type, timestamp)
+
+    def get_all_documents(self):
+        """
+        Retrieves all documents, embeddings, and metadata of the collection, from the oldest to the newest.
+        """
+        return self.database.get_all_documents(self.collection_name)
+
+    def _search(self, queries, n_results, doc_types, since, until):
+        query_embeddings = Memories._normalize(self.model.encode(list(queries), show_progress_bar=False))
+        return self.database.search(query_embeddings, [self.collection_name], n_results, doc_types, since,
+                                    until)[self.collection_name]
+
+    def query_batch(self, queries, n_results=5, doc_types=None, since=None, until=None):
+        """
+        Queries the collection for all queries at once, like `Memories.query_batch`.
+
+        Returns:
+            tuple: The result lists, one per query, and the merged list of every query results.
+        """
+        if not queries:
+            return [], []
+
+        per_query = [[document for _, _, document in hits if document]
+                     for hits in self._search(queries, n_results, doc_types, since, until)]
+        return per_query, [document for results in per_query for document in results]
+
+    async def aquery_batch(self, queries, n_results=5, doc_types=None, since=None, until=None):
+        """
+        Non-blocking `query_batch`: encoding and scoring run on the memories executor.
+        """
+        return await asyncio.get_running_loop().run_in_executor(_executor, self.query_batch, queries, n_results,
+                                                                doc_types, since, until)
+
+    def query_merged(self, queries, n_results=5, max_chars=None, max_tokens=None, doc_types=None, since=None,
+                     until=None):
+        """
+        Queries the collection and merges the results into one deduplicated list fitting in the budget, like
+        `Memories.query_merged`.
+        """
+        if not queries:
+            return []
+
+        best = {}
+        for hits in self._search(queries, n_results, doc_types, since, until):
+            for similarity, timestamp, document in hits:
+                if document and (document not in best or best[document] < (similarity, timestamp)):
+                    best[document] = (similarity, timestamp)
+
+        return fit_to_budget(sorted(best, key=best.get, reverse=True), max_chars, max_tokens)
+
+    async def aquery_merged(self, queries, n_results=5, max_chars=None, max_tokens=None, doc_types=None, since=None,
+                            until=None):
+        """
+        Non-blocking `query_merged`: encoding and scoring run on the memories executor.
+        """
+        return await asyncio.get_running_loop().run_in_executor(_executor, self.query_merged, queries, n_results,
+                                                                max_chars, max_tokens, doc_types, since, until)
+
+    def query_multiple(self, queries, n_results=5, doc_types=None, since=None, until=None):
+        """
+        Queries the collection for the most similar documents to the given queries.
+        """
+        return self.query_batch(queries, n_results, doc_types, since, until)[1]
+
+    async def aquery_multiple(self, queries, n_results=5, doc_types=None, since=None, until=None):
+        """
+        Non-blocking `query_multiple`: encoding and scoring run on the memories executor.
+        """
+        return (await self.aquery_batch(queries, n_results, doc_types, since, until))[1]
+
+
+def _open_collection(source_folder: str, collection_file: str, model_name: str) -> Memories:
+    """
+    Opens a collection to migrate, read-only, at the capacity and precision it was stored with, so no document is
+    evicted while loading it.
+    """
+    settings = stored_settings(os.path.join(source_folder, collection_file))
+    memory = Memories(collection_file, base_folder=source_folder, model_name=model_name, index=None, read_only=True,
+                      **settings)
+    if 'precision' in settings or not memory._log_records:
+        return memory
+
+    # No ring snapshot records the capacity (legacy pickle or log only): leave room for every logged insert
+    settings['max_documents'] = memory.max_documents + memory._log_records
+    memory.close()
+    return Memories(collection_file, base_folder=source_folder, model_name=model_name, index=None, read_only=True,
+                    **settings)
+
+
+def migrate_collections(source_folder: str, database_path: str, model_name: str = DEFAULT_EMBEDDING_MODEL) -> dict:
+    """
+    Copies every `*_mem.pkl` collection of a folder (legacy pickle, snapshot and log) into a shared database.
+    The source files are left untouched, and collections already present in the database are skipped.
+
+    Args:
+        source_folder (str): Folder holding the agent memories (the `persistance_path` of the client config).
+        database_path (str): Path of the shared SQLite database.
+        model_name (str): Embedding model of the collections.
+
+    Returns:
+        dict: Number of migrated documents per collection.
+    """
+    collection_files = set()
+    for pattern in ('*_mem.pkl', '*_mem.pkl.log', '*_mem.mem'):
+        for path in glob.glob(os.path.join(source_folder, pattern)):
+            name = os.path.basename(path)
+            collection_files.add(name[:name.index('_mem.')] + '_mem.pkl')
+
+    database = open_database(database_path, model_name)
+    migrated = {}
+    try:
+        existing = set(database.collections())
+        for collection_file in sorted(collection_files):
+            collection = collection_file[:-len('_mem.pkl')]
+            if collection in existing:
+                logger.info(f"Agent-Module: [key='MemoryDatabase'] | Skipping {collection}, already migrated")
+                continue
+
+            memory = _open_collection(source_folder, collection_file, model_name)
+            try:
+                documents, embeddings, metadatas = memory.get_all_documents()
+            finally:
+                memory.close()
+
+            database.insert(collection, documents, np.array(embeddings, dtype=np.float32), metadatas)
+            # Agents keep the collection at the capacity it was stored with
+            database.set_capacity(collection, memory.max_documents)
+            migrated[collection] = len(documents)
+            logger.info(f"Agent-Module: [key='MemoryDatabase'] | Migrated {len(documents)} documents of {collection}")
+    finally:
+        close_database(database_path)
+
+    return migrated
@@ -0,0 +1,204 @@
+import glob
+import logging
+import os
+import pickle
+import struct
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'AGTMEM'
+FORMAT_VERSION = 1
+# Codes of the embedding precisions stored in the header
+PRECISION_CODES = {'float32': 0, 'float16': 1, 'int8': 2}
+DTYPES = {'float32': '<f4', 'float16': '<f2', 'int8': 'i1'}
+
+# magic, version, precision code, dimension, capacity, size, next slot, sequence, embeddings offset, metadata offset
+_HEADER = struct.Struct('<6sHB3xIIIIQQQ')
+_HEADER_SIZE = 64
+_ALIGNMENT = 64
+_LENGTH = struct.Struct('<I')
+# Document length of an empty ring buffer slot
+_NO_DOCUMENT = 0xFFFFFFFF
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def write_snapshot(f, snapshot: dict) -> None:
+    """
+    Writes a `Memories` snapshot in the versioned binary format:
+        - a 64 bytes header (magic, format version, precision, ring shape & state, section offsets),
+        - the contiguous (capacity x dimension) embeddings block, 64-bytes aligned so it can be memory-mapped,
+        - the metadata columns: timestamps (float64), scales (float32) and type codes (int16) of every slot,
+        - the type names, then the documents, as length-prefixed UTF-8 strings.
+
+    Args:
+        f: A binary file opened for writing.
+        snapshot (dict): The ring buffer state, with the keys returned by `read_snapshot`.
+    """
+    embeddings = np.ascontiguousarray(snapshot['embeddings'], dtype=DTYPES[snapshot['precision']])
+    capacity, dimension = embeddings.shape
+    embeddings_offset = _aligned(_HEADER_SIZE)
+    metadata_offset = _aligned(embeddings_offset + embeddings.nbytes)
+
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, PRECISION_CODES[snapshot['precision']], dimension, capacity,
+                          snapshot['size'], snapshot['next_slot'], snapshot['sequence'], embeddings_offset,
+                          metadata_offset)
+    f.write(header.ljust(embeddings_offset, b'\0'))
+    f.write(embeddings.tobytes())
+    f.write(b'\0' * (metadata_offset - embeddings_offset - embeddings.nbytes))
+
+    f.write(np.asarray(snapshot['timestamps'], dtype='<f8').tobytes())
+    f.write(np.asarray(snapshot['scales'], dtype='<f4').tobytes())
+    f.write(np.asarray(snapshot['type_codes'], dtype='<i2').tobytes())
+
+    f.write(_LENGTH.pack(len(snapshot['type_names'])))
+    for type_name in snapshot['type_names']:
+        encoded = type_name.encode('utf-8')
+        f.write(_LENGTH.pack(len(encoded)) + encoded)
+
+    encoded_documents = [None if document is None else document.encode('utf-8') for document in snapshot['documents']]
+    lengths = np.array([_NO_DOCUMENT if encoded is None else len(encoded) for encoded in encoded_documents],
+                       dtype='<u4')
+    f.write(lengths.tobytes())
+    f.write(b''.join(encoded for encoded in encoded_documents if encoded is not None))
+
+
+def read_snapshot(path: str) -> dict:
+    """
+    Reads a snapshot written by `write_snapshot`. The embeddings block is opened as a copy-on-write memmap, so only
+    the pages actually scored are read from disk.
+
+    Returns:
+        dict: embeddings, precision, documents, type_codes, type_names, timestamps, scales, next_slot, size, sequence.
+
+    Raises:
+        ValueError: If the file is not a memory snapshot or was written by a newer format version.
+    """
+    with open(path, 'rb') as f:
+        header = _read_header(f, path)
+        capacity, metadata_offset = header['capacity'], header['metadata_offset']
+
+        f.seek(metadata_offset)
+        timestamps = np.frombuffer(f.read(capacity * 8), dtype='<f8').copy()
+        scales = np.frombuffer(f.read(capacity * 4), dtype='<f4').copy()
+        type_codes = np.frombuffer(f.read(capacity * 2), dtype='<i2').copy()
+
+        (type_count,) = _LENGTH.unpack(f.read(_LENGTH.size))
+        type_names = []
+        for _ in range(type_count):
+            (length,) = _LENGTH.unpack(f.read(_LENGTH.size))
+            type_names.append(f.read(length).decode('utf-8'))
+
+        lengths = np.frombuffer(f.read(capacity * 4), dtype='<u4')
+        blob = f.read()
+
+    present = lengths != _NO_DOCUMENT
+    ends = np.cumsum(np.where(present, lengths, 0)).tolist()
+    starts = [0] + ends[:-1]
+    text = blob.decode('utf-8')
+    if len(text) == len(blob):
+        # ASCII only: byte offsets are character offsets, so the documents are sliced out of a single decode
+        documents = [text[start:end] if is_present else None
+                     for start, end, is_present in zip(starts, ends, present.tolist())]
+    else:
+        documents = [blob[start:end].decode('utf-8') if is_present else None
+                     for start, end, is_present in zip(starts, ends, present.tolist())]
+
+    return {
+        'embeddings': _map_embeddings(path, header),
+        'precision': header['precision'],
+        'documents': documents,
+        'type_codes': type_codes,
+        'type_names': type_names,
+        'timestamps': timestamps,
+        'scales': scales,
+        'next_slot': header['next_slot'],
+        'size': header['size'],
+        'sequence': header['sequence']
+    }
+
+
+def _read_header(f, path: str) -> dict:
+    header = f.read(_HEADER_SIZE)
+    if len(header) < _HEADER.size or header[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a memory snapshot")
+
+    (_, version, precision_code, dimension, capacity, size, next_slot, sequence, embeddings_offset,
+     metadata_offset) = _HEADER.unpack_from(header)
+    if version > FORMAT_VERSION:
+        raise ValueError(f"{path} uses memory format version {version}, newer than {FORMAT_VERSION}")
+
+    return {
+        'precision': next(name for name, code in PRECISION_CODES.items() if code == precision_code),
+        'dimension': dimension,
+        'capacity': capacity,
+        'size': size,
+        'next_slot': next_slot,
+        'sequence': sequence,
+        'embeddings_offset': embeddings_offset,
+        'metadata_offset': metadata_offset
+    }
+
+
+def _map_embeddings(path: str, header: dict) -> np.memmap:
+    return np.memmap(path, dtype=DTYPES[header['precision']], mode='c', offset=header['embeddings_offset'],
+                     shape=(header['capacity'], header['dimension']))
+
+
+def map_embeddings(path: str) -> np.memmap:
+    """Opens only the embeddings block of a snapshot, as a copy-on-write memmap."""
+    with open(path, 'rb') as f:
+        header = _read_header(f, path)
+    return _map_embeddings(path, header)
+
+
+def stored_settings(file_path: str) -> dict:
+    """
+    Capacity and precision a collection was stored with (read from its `.mem` header), so reopening it to convert or
+    migrate it never drops documents nor requantises them. Legacy pickles only give a lower bound of the capacity (no
+    precision), and an empty dict is returned when there is no snapshot.
+    """
+    stem = os.path.splitext(file_path)[0]
+    if os.path.exists(f'{stem}.mem'):
+        with open(f'{stem}.mem', 'rb') as f:
+            header = _read_header(f, f'{stem}.mem')
+        return {'max_documents': header['capacity'], 'precision': header['precision']}
+    if os.path.exists(file_path):
+        with open(file_path, 'rb') as f:
+            return {'max_documents': max(500, len(pickle.load(f).get('documents', [])))}
+    return {}
+
+
+def convert_collections(folder: str) -> list[str]:
+    """
+    Converts every `*_mem.pkl` collection of a folder (legacy pickle, plus its log) to the versioned binary format.
+    Legacy pickles are kept.
+
+    Returns:
+        list: The converted collection files.
+    """
+    from modules.agent_memories import Memories
+
+    collection_files = set()
+    for pattern in ('*_mem.pkl', '*_mem.pkl.log', '*_mem.mem'):
+        for path in glob.glob(os.path.join(folder, pattern)):
+            name = os.path.basename(path)
+            collection_files.add(name[:name.index('_mem.')] + '_mem.pkl')
+
+    converted = []
+    for collection_file in sorted(collection_files):
+        memory = Memories(collection_file, base_folder=folder, index=None,
+                          **stored_settings(os.path.join(folder, collection_file)))
+        try:
+            with memory._lock:
+                memory._save_memory()
+        finally:
+            memory.close()
+        converted.append(collection_file)
+        logger.info(f"Agent-Module: [key='MemoryFormat'] | Converted {collection_file} to format v{FORMAT_VERSION}")
+
+    return converted
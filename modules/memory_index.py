@@ -0,0 +1,152 @@
+import os
+
+import numpy as np
+
+
+class VectorIndex:
+    """
+    Interface of the approximate nearest-neighbour indexes pluggable into `Memories`.
+
+    Indexes do not own the embeddings: they only track ring buffer slots and narrow a query down to candidate slots,
+    which `Memories` then scores exactly against its embedding matrix.
+
+    Methods:
+    - add: Indexes the embedding stored in a ring buffer slot.
+    - remove: Forgets a slot (called when its document is evicted).
+    - candidates: Returns the candidate slots for a query.
+    - save / load: Persists the index next to the collection file.
+    """
+
+    ready: bool = False
+    # Sequence number of the collection snapshot the index was saved with
+    sequence: int = 0
+    # Ring layout (next_slot, precision, max_documents) of that snapshot: slots are only meaningful in that layout
+    layout: tuple = ()
+
+    def add(self, slot: int, embedding: np.ndarray) -> None:
+        raise NotImplementedError
+
+    def remove(self, slot: int) -> None:
+        raise NotImplementedError
+
+    def candidates(self, query_embedding: np.ndarray, embeddings: np.ndarray, size: int) -> np.ndarray | None:
+        """Returns candidate slots, or None when the index cannot answer yet (exact search is used instead)."""
+        raise NotImplementedError
+
+    def save(self, path: str) -> None:
+        raise NotImplementedError
+
+    def load(self, path: str) -> bool:
+        """Loads the index from `path`, returns False if missing or incompatible."""
+        raise NotImplementedError
+
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file index built in NumPy.
+
+    Normalised embeddings are clustered with spherical k-means into `sqrt(size)` lists. Every slot is assigned to its
+    nearest centroid, and a query only scores the slots of its `n_probe` closest lists. Insertion and deletion are O(1)
+    updates of the slot assignments. The centroids are retrained once the collection doubled since the last training.
+
+    Attributes:
+        capacity (int): Number of ring buffer slots.
+        n_probe (int): Number of lists scanned per query.
+        min_size (int): Number of documents required before the index is trained.
+        centroids (np.ndarray | None): (n_lists x dim) normalised centroids.
+        assignments (np.ndarray): List id of every slot, -1 for empty slots.
+    """
+
+    def __init__(self, capacity: int, n_probe: int = 8, min_size: int = 20_000, training_sample: int = 20_000,
+                 iterations: int = 10, seed: int = 0):
+        self.capacity = capacity
+        self.n_probe = n_probe
+        self.min_size = min_size
+        self.training_sample = training_sample
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids: np.ndarray | None = None
+        self.assignments = np.full(capacity, -1, dtype=np.int32)
+        self.trained_size = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.centroids is not None
+
+    def add(self, slot, embedding):
+        if self.centroids is not None:
+            self.assignments[slot] = int(np.argmax(self.centroids @ embedding))
+
+    def remove(self, slot):
+        self.assignments[slot] = -1
+
+    @staticmethod
+    def _unit_rows(embeddings: np.ndarray) -> np.ndarray:
+        """Float32 row-normalised copy, so quantised (float16/int8) matrices can be clustered as well."""
+        embeddings = embeddings.astype(np.float32)
+        return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+    def train(self, embeddings: np.ndarray, size: int) -> None:
+        """
+        Runs spherical k-means on (a sample of) the first `size` embeddings, then assigns every slot.
+        """
+        rng = np.random.default_rng(self.seed)
+        n_lists = max(1, int(np.sqrt(size)))
+        sample = self._unit_rows(embeddings[rng.choice(size, min(size, self.training_sample), replace=False)])
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(self.iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty lists keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        self.centroids = centroids.astype(np.float32)
+        self.assignments[:] = -1
+        for start in range(0, size, 8192):
+            block = self._unit_rows(embeddings[start:min(start + 8192, size)])
+            self.assignments[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        self.trained_size = size
+
+    def candidates(self, query_embedding, embeddings, size):
+        if size < self.min_size:
+            return None
+        if self.centroids is None or size >= 2 * self.trained_size:
+            self.train(embeddings, size)
+
+        n_probe = min(self.n_probe, len(self.centroids))
+        probed = np.argpartition(-(self.centroids @ query_embedding), n_probe - 1)[:n_probe]
+        return np.flatnonzero(np.isin(self.assignments[:size], probed))
+
+    def save(self, path):
+        if self.centroids is None:
+            return
+
+        temporary_path = f'{path}.tmp.npz'
+        next_slot, precision, max_documents = self.layout
+        np.savez(temporary_path, centroids=self.centroids, assignments=self.assignments,
+                 trained_size=self.trained_size, sequence=self.sequence, next_slot=next_slot, precision=precision,
+                 max_documents=max_documents)
+        os.replace(temporary_path, path)
+
+    def load(self, path):
+        if not os.path.exists(path):
+            return False
+
+        with np.load(path) as data:
+            if data['assignments'].shape != self.assignments.shape:
+                return False
+            self.centroids = data['centroids']
+            self.assignments = data['assignments'].copy()
+            self.trained_size = int(data['trained_size'])
+            self.sequence = int(data['sequence'])
+            self.layout = (int(data['next_slot']), str(data['precision']), int(data['max_documents']))
+        return True
+
+
+# Available approximate indexes, selectable through `Memories(index=...)`
+INDEXES: dict[str, type[VectorIndex]] = {
+    'ivf': IVFIndex,
+}
@@ -0,0 +1,177 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    """
+    Coalesces `Memories` inserts in a background thread.
+
+    Inserts are queued, and the writer thread wakes up once `batch_size` inserts are pending or the oldest one waited
+    `max_delay` seconds. The whole batch is then embedded with a single `encode` call, and each collection of the batch
+    is written with a single log flush (see `Memories.insert_encoded`). One writer is shared by every collection using
+    the same embedding model, so agents reflecting at the same time share their encoder calls.
+
+    `flush` drains the queue synchronously and waits for the batch in flight, giving readers read-your-writes.
+
+    A batch whose encoding or insert fails is retried collection by collection, so one failing collection never drops
+    the inserts of the others. `submit` returns a future resolved once the insert is written, or failed with the error.
+
+    Attributes:
+        model: The shared (cached) encoder.
+        batch_size (int): Number of pending inserts triggering a write.
+        max_delay (float): Maximum time, in seconds, an insert waits in the queue.
+    """
+
+    def __init__(self, model, batch_size: int = 16, max_delay: float = 0.05):
+        self.model = model
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.batches = 0
+        self.inserts = 0
+        self.failures = 0
+
+        self._pending = []
+        self._oldest = None
+        self._stopping = False
+        self._condition = threading.Condition()
+        # Held while a batch is encoded & written, so `flush` also waits for the batch in flight
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='memories-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, memory, document: str, metadata: dict) -> Future:
+        """Queues an insert, returns immediately with the future of its write."""
+        future = Future()
+        with self._condition:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append((memory, document, metadata, future))
+            self._condition.notify()
+        return future
+
+    def pending(self, memory=None) -> int:
+        """Number of queued inserts, for one collection or all of them."""
+        with self._condition:
+            return sum(1 for entry in self._pending if memory is None or entry[0] is memory)
+
+    def _take(self):
+        with self._condition:
+            batch, self._pending, self._oldest = self._pending, [], None
+            return batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+
+                while len(self._pending) < self.batch_size and not self._stopping:
+                    remaining = self._oldest + self.max_delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+            self.flush()
+
+    def flush(self):
+        """Writes every queued insert now, and waits for the batch in flight."""
+        with self._write_lock:
+            batch = self._take()
+            if not batch:
+                return
+
+            collections = {}
+            for memory, document, metadata, future in batch:
+                collections.setdefault(memory, []).append((document, metadata, future))
+
+            try:
+                embeddings = self.model.encode([document for _, document, _, _ in batch], show_progress_bar=False)
+            except Exception as e:
+                logger.warning(f"Agent-Module: [key='BatchWriter'] | Failed to encode a batch of {len(batch)} "
+                               f"memories, encoding each collection separately: {e}")
+                embeddings = None
+
+            collection_embeddings = {}
+            if embeddings is not None:
+                for (memory, _, _, _), embedding in zip(batch, embeddings):
+                    collection_embeddings.setdefault(memory, []).append(embedding)
+
+            written = sum(self._write(memory, entries, collection_embeddings.get(memory))
+                          for memory, entries in collections.items())
+            self.batches += 1
+            self.inserts += written
+            logger.debug(f"Agent-Module: [key='BatchWriter'] | Wrote {written}/{len(batch)} memories "
+                         f"to {len(collections)} collections")
+
+    def _write(self, memory, entries, embeddings=None) -> int:
+        """
+        Writes the inserts of one collection (encoding them first if `embeddings` is None) and resolves their futures.
+        Returns the number of inserts written.
+        """
+        documents = [document for document, _, _ in entries]
+        try:
+            if embeddings is None:
+                embeddings = self.model.encode(documents, show_progress_bar=False)
+            memory.insert_encoded(documents, embeddings, [metadata for _, metadata, _ in entries])
+        except Exception as e:
+            self.failures += len(entries)
+            logger.error(f"Agent-Module: [key='BatchWriter'] | Failed to write {len(entries)} memories to "
+                         f"{getattr(memory, 'file_path', memory)}: {e}")
+            for _, _, future in entries:
+                future.set_exception(e)
+            return 0
+
+        for _, _, future in entries:
+            future.set_result(None)
+        return len(entries)
+
+    def stop(self):
+        """Writes the queued inserts and stops the writer thread."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+
+# Process-wide registry: one writer per embedding model, shared by every collection using it.
+_lock = threading.Lock()
+_writers: dict[str, BatchWriter] = {}
+_references: dict[str, int] = {}
+
+
+def acquire_writer(model_name: str, model, batch_size: int = 16, max_delay: float = 0.05) -> BatchWriter:
+    """
+    Returns the shared writer of `model_name`, starting it on first use (with the given settings).
+    Every call must be paired with `release_writer`.
+    """
+    with _lock:
+        if model_name not in _writers:
+            _writers[model_name] = BatchWriter(model, batch_size, max_delay)
+            _references[model_name] = 0
+
+        _references[model_name] += 1
+        return _writers[model_name]
+
+
+def release_writer(model_name: str) -> None:
+    """
+    Drops one reference to the shared writer, stopping it (after writing its queue) when no reference is left.
+    """
+    with _lock:
+        if model_name not in _references:
+            return
+
+        _references[model_name] -= 1
+        if _references[model_name] > 0:
+            return
+
+        writer = _writers.pop(model_name)
+        del _references[model_name]
+    writer.stop()
@@ -1,8 +1,8 @@
-import ollama
-
 from configs.ollama_options import QUERIES_OPTIONS
-from utils.agent.agent_utils import split_queries, _wait_time_out
+from modules.llm_gateway import LLMGateway, shared_gateway
+from utils.agent.agent_utils import compact_prompt, split_queries
 from utils.agent.base_prompts import query_prompt_base
+from utils.agent.prompt_budget import PromptBudget
 
 
 class QueryEngine:
@@ -16,8 +16,9 @@ class QueryEngine:
     while response (used to forge response) queries inject agent related information into the prompt.
     """
 
-    def __init__(self, model):
+    def __init__(self, model, llm: LLMGateway | None = None):
         self.model = model
+        self.llm = llm or shared_gateway()
 
     async def create_transcript_queries(self, messages):
         """
@@ -30,21 +31,21 @@ class QueryEngine:
             list: A list of cleaned query strings.
         """
         if messages:
-            msgs = '\n'.join(messages)
-
-            response = await _wait_time_out(
-                ollama.AsyncClient().generate(
-                    model=self.model,
-                    prompt=msgs,
-                    system=query_prompt_base,
-                    options=QUERIES_OPTIONS
-                ),
-                timeout=120,
-                timeout_message="Query Generation Aborted!",
+            budget = PromptBudget('create_transcript_queries', QUERIES_OPTIONS)
+            msgs = '\n'.join(budget.items('transcript', messages, keep='last'))
+            system = compact_prompt(query_prompt_base)
+            budget.log_usage(system, msgs)
+
+            response = await self.llm.generate(
+                'create_transcript_queries',
+                model=self.model,
+                prompt=msgs,
+                system=system,
+                options=QUERIES_OPTIONS,
                 default_return=""
             )
 
-            return split_queries(response['response'])
+            return split_queries(response)
 
         return []
 
@@ -64,12 +65,19 @@ class QueryEngine:
         if messages is None:
             messages = ['No message at the moment.']
 
-        msgs = '\n'.join(messages)
+        budget = PromptBudget('create_response_queries', QUERIES_OPTIONS)
+        plan = budget.text('plan', plan)
+        context = budget.text('context', context)
+        msgs = '\n'.join(budget.items('messages', messages, keep='last'))
 
-        system_instruction = f"""
-Your personality is as follows:
+        # Static prefix first (identical across calls, so the server reuses its KV cache), volatile sections after
+        system_instruction = compact_prompt(f"""
 {personality}
-    
+
+{query_prompt_base}
+""")
+
+        prompt = compact_prompt(f"""
 Your current plan is:
 {plan}
 
@@ -78,19 +86,17 @@ Here is the context from your notebook or diary:
 
 ---
 
-{query_prompt_base}
-"""
+{msgs}
+""")
+        budget.log_usage(system_instruction, prompt)
 
-        response = await _wait_time_out(
-            ollama.AsyncClient().generate(
-                model=self.model,
-                prompt=msgs,
-                system=system_instruction,
-                options=QUERIES_OPTIONS
-            ),
-            timeout=120,
-            timeout_message="Query Generation Aborted!",
+        response = await self.llm.generate(
+            'create_response_queries',
+            model=self.model,
+            prompt=prompt,
+            system=system_instruction,
+            options=QUERIES_OPTIONS,
             default_return=""
         )
 
-        return split_queries(response['response'])
+        return split_queries(response)
@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import math
 import re
 from types import SimpleNamespace
 
@@ -14,6 +15,55 @@ async def _wait_time_out(tasks, timeout=30, timeout_message="Operation timed out
         return default_return
 
 
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token count estimate (about 4 characters per token for English with llama-like tokenizers).
+    """
+    return math.ceil(len(text) / 4)
+
+
+def fit_to_budget(texts, max_chars=None, max_tokens=None):
+    """
+    Keeps texts, in order, while they fit in the character and/or token budget. Texts that would overflow the budget
+    are skipped, so a shorter text ranked lower can still fill the remaining space.
+
+    Args:
+        texts (list): Texts sorted by decreasing priority.
+        max_chars (int, optional): Character budget, unlimited if None.
+        max_tokens (int, optional): Token budget (see `estimate_tokens`), unlimited if None.
+
+    Returns:
+        list: The texts fitting in the budget.
+    """
+    kept, chars, tokens = [], 0, 0
+    for text in texts:
+        text_chars, text_tokens = len(text), estimate_tokens(text)
+        if max_chars is not None and chars + text_chars > max_chars:
+            continue
+        if max_tokens is not None and tokens + text_tokens > max_tokens:
+            continue
+
+        kept.append(text)
+        chars, tokens = chars + text_chars, tokens + text_tokens
+
+    return kept
+
+
+def compact_prompt(text: str) -> str:
+    """
+    Strips the indentation and trailing spaces of every line and collapses runs of blank lines, so a prompt built from
+    an indented f-string always renders to the same (and fewer) tokens.
+
+    Args:
+        text (str): The prompt.
+
+    Returns:
+        str: The whitespace-minimised prompt.
+    """
+    lines = [line.strip() for line in text.strip().splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines))
+
+
 class DictToAttribute(SimpleNamespace):
     """SimpleNameSpace + get method compability :D"""
 
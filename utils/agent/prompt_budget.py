@@ -0,0 +1,144 @@
+import logging
+import re
+
+from configs.ollama_options import BASE_OPTIONS, PROMPT_BUDGETS
+from utils.agent.agent_utils import estimate_tokens, fit_to_budget
+
+logger = logging.getLogger(__name__)
+
+# Tokens kept free in the context window for the chat template & role headers
+TEMPLATE_OVERHEAD = 64
+
+
+def trim_text(text: str, max_tokens: int | None) -> str:
+    """
+    Compresses a text (runs of spaces and blank lines collapsed) and, if it still exceeds `max_tokens`, cuts it at the
+    last sentence (or word) boundary fitting in the budget.
+
+    Args:
+        text (str): The text to fit.
+        max_tokens (int, optional): Token budget (see `estimate_tokens`), unlimited if None.
+
+    Returns:
+        str: The text fitting in the budget, ending with '…' if it was cut.
+    """
+    text = re.sub(r'\n\s*\n+', '\n\n', re.sub(r'[ \t]+', ' ', text)).strip()
+    if max_tokens is None or estimate_tokens(text) <= max_tokens:
+        return text
+
+    # One token is kept for the ellipsis
+    cut = text[:max(max_tokens - 1, 0) * 4]
+    boundary = max(cut.rfind('. '), cut.rfind('! '), cut.rfind('? '), cut.rfind('\n'))
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary + 1]
+    elif ' ' in cut:
+        cut = cut[:cut.rfind(' ')]
+    return f"{cut.rstrip()} …"
+
+
+def keep_recent(items, max_tokens: int | None) -> list:
+    """
+    Keeps the most recent items (the end of the list) fitting in `max_tokens`, stopping at the first one that does not
+    fit so the kept transcript has no gap.
+    """
+    if max_tokens is None:
+        return list(items)
+
+    kept, tokens = [], 0
+    for item in reversed(list(items)):
+        tokens += estimate_tokens(item)
+        if tokens > max_tokens:
+            break
+        kept.append(item)
+    return kept[::-1]
+
+
+class PromptBudget:
+    """
+    Token budget of one module prompt, split into sections (`PROMPT_BUDGETS[task]`).
+
+    Each volatile section (plan, memories, context, messages...) is fitted to its own budget before the prompt is
+    built, so prompts never overflow the context window (which Ollama would silently truncate) and prompt-eval time
+    stays predictable. The static system prompt is never trimmed, since it is the prefix reused from the server's KV
+    cache; it is only checked against its budget. The budgets of a task must fit in `num_ctx` with the `num_predict`
+    generated tokens.
+
+    Counts are estimates (see `estimate_tokens`); `log_usage` reports them per section, and the gateway logs the
+    prompt tokens actually evaluated by the server.
+
+    Attributes:
+        task (str): Name of the module method building the prompt.
+        budgets (dict): Token budget of each section, None for unlimited.
+        usage (dict): Estimated tokens of each fitted section.
+        trimmed (dict): Sections that were trimmed, with their estimated tokens before trimming.
+    """
+
+    def __init__(self, task: str, options: dict | None = None):
+        options = options or BASE_OPTIONS
+        self.task = task
+        self.budgets: dict[str, int | None] = PROMPT_BUDGETS.get(task, {})
+        self.num_ctx: int = options.get('num_ctx', BASE_OPTIONS['num_ctx'])
+        self.num_predict: int = max(options.get('num_predict', 0), 0)
+        self.usage: dict[str, int] = {}
+        self.trimmed: dict[str, int] = {}
+
+        total = sum(budget for budget in self.budgets.values() if budget is not None)
+        if total + self.num_predict + TEMPLATE_OVERHEAD > self.num_ctx:
+            raise ValueError(f"Prompt budgets of {task} ({total} tokens) and num_predict ({self.num_predict}) "
+                             f"exceed num_ctx ({self.num_ctx})")
+
+    def text(self, section: str, text: str) -> str:
+        """Fits a text section to its budget (see `trim_text`)."""
+        fitted = trim_text(text, self.budgets.get(section))
+        self._account(section, estimate_tokens(text), estimate_tokens(fitted))
+        return fitted
+
+    def items(self, section: str, items, keep: str = 'first') -> list:
+        """
+        Fits a list section (memories, messages) to its budget.
+
+        Args:
+            section (str): The section name.
+            items (list): The section items.
+            keep (str): 'first' keeps the items in order of priority (skipping the ones overflowing the budget),
+                'last' keeps the most recent items (transcripts).
+
+        Returns:
+            list: The items fitting in the budget.
+        """
+        items = list(items)
+        budget = self.budgets.get(section)
+        fitted = keep_recent(items, budget) if keep == 'last' else fit_to_budget(items, max_tokens=budget)
+        self._account(section, sum(map(estimate_tokens, items)), sum(map(estimate_tokens, fitted)))
+        return fitted
+
+    def _account(self, section, before, after):
+        self.usage[section] = after
+        if after < before:
+            self.trimmed[section] = before
+
+    def log_usage(self, system: str, prompt: str) -> int:
+        """
+        Logs the estimated tokens of the built prompt, per section, against the context window.
+
+        Returns:
+            int: The estimated prompt tokens.
+        """
+        system_tokens = estimate_tokens(system)
+        total = system_tokens + estimate_tokens(prompt)
+        window = self.num_ctx - self.num_predict - TEMPLATE_OVERHEAD
+
+        sections = ', '.join(
+            f"{section}={tokens}" + (f" (trimmed from {self.trimmed[section]})" if section in self.trimmed else '')
+            for section, tokens in self.usage.items()
+        )
+        logger.info(f"Agent-Module: [key='PromptBudget'] | {self.task}: ~{total}/{window} prompt tokens "
+                    f"(system={system_tokens}, {sections})")
+
+        if self.budgets.get('system') is not None and system_tokens > self.budgets['system']:
+            logger.warning(f"Agent-Module: [key='PromptBudget'] | {self.task}: system prompt (~{system_tokens} tokens) "
+                           f"exceeds its budget of {self.budgets['system']}")
+        if total > window:
+            logger.warning(f"Agent-Module: [key='PromptBudget'] | {self.task}: prompt (~{total} tokens) exceeds the "
+                           f"context window, the server will truncate it")
+        return total
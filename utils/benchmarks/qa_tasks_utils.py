@@ -2,12 +2,14 @@
 # noinspection PyUnresolvedReferences
 import pytextrank
 import spacy
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_distances
 from transformers import BartTokenizer, BartForConditionalGeneration
 
+from utils.embedding_models import acquire_model, DEFAULT_EMBEDDING_MODEL
+
 model = None
 tokenizer = None
+embedders = {}
 nlp = spacy.load("en_core_web_sm")
 nlp.add_pipe("textrank")
 
@@ -57,8 +59,10 @@ def summarize_text(text):
     return summary
 
 
-def compute_cosine_distances(documents, model_name='all-MiniLM-L6-v2'):
-    global model
-    model = SentenceTransformer(model_name)
-    embeddings = model.encode(documents, convert_to_numpy=True)
+def compute_cosine_distances(documents, model_name=DEFAULT_EMBEDDING_MODEL):
+    # The shared model is acquired once and kept for the whole benchmark run
+    if model_name not in embedders:
+        embedders[model_name] = acquire_model(model_name)
+
+    embeddings = embedders[model_name].encode(documents, convert_to_numpy=True)
     return cosine_distances(embeddings)
@@ -0,0 +1,200 @@
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+DEFAULT_CACHE_ENTRIES = 10_000
+
+
+class CachedEncoder:
+    """
+    Wraps a SentenceTransformer with a bounded LRU cache of text -> embedding.
+
+    Repeated texts (plans, personality prompts, recurring queries or channel messages) become dictionary lookups,
+    and only the cache misses of a call are sent to the model, in a single batch.
+    The cache can optionally be persisted to `cache_path`, so it survives restarts.
+
+    Attributes:
+        model (SentenceTransformer): The wrapped model.
+        max_entries (int): Maximum number of cached embeddings, least recently used entries are evicted first.
+        cache_path (str | None): Pickle file the cache is loaded from and saved to, if any.
+        hits (int): Number of texts served from the cache.
+        misses (int): Number of texts that had to be encoded.
+    """
+
+    def __init__(self, model: SentenceTransformer, max_entries: int = DEFAULT_CACHE_ENTRIES,
+                 cache_path: str | None = None):
+        self.model = model
+        self.max_entries = max_entries
+        self.cache_path = cache_path
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, 'rb') as f:
+                self._cache.update(pickle.load(f))
+            self._evict()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, sentences, show_progress_bar=False, convert_to_numpy=True):
+        """
+        Encodes a text or a list of texts, like `SentenceTransformer.encode`, always returning NumPy arrays.
+
+        Cached embeddings are read-only arrays shared between callers.
+        """
+        texts = [sentences] if isinstance(sentences, str) else list(sentences)
+
+        with self._lock:
+            embeddings = {text: self._cache[text] for text in texts if text in self._cache}
+            for text in embeddings:
+                self._cache.move_to_end(text)
+            missing = list(dict.fromkeys(text for text in texts if text not in embeddings))
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            encoded = self.model.encode(missing, show_progress_bar=show_progress_bar, convert_to_numpy=True)
+            encoded.setflags(write=False)
+            with self._lock:
+                for text, embedding in zip(missing, encoded):
+                    embeddings[text] = self._cache[text] = embedding
+                self._evict()
+
+        if isinstance(sentences, str):
+            return embeddings[sentences]
+        if not texts:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.stack([embeddings[text] for text in texts])
+
+    def _evict(self):
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def cache_info(self) -> dict:
+        """Returns the cache hit/miss counters and current size."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._cache),
+                'max_entries': self.max_entries
+            }
+
+    def save(self):
+        """Persists the cache to `cache_path` (no-op when the cache is memory-only)."""
+        if not self.cache_path:
+            return
+
+        with self._lock:
+            entries = dict(self._cache)
+
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        temporary_path = f'{self.cache_path}.tmp'
+        with open(temporary_path, 'wb') as f:
+            pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, self.cache_path)
+
+
+# Process-wide registry: one cached model per model name, shared by every agent memory & benchmark.
+_lock = threading.Lock()
+_models: dict[str, CachedEncoder] = {}
+_references: dict[str, int] = {}
+_cache_settings = {'max_entries': DEFAULT_CACHE_ENTRIES, 'cache_folder': None}
+
+
+def configure_cache(max_entries: int = DEFAULT_CACHE_ENTRIES, cache_folder: str | None = None) -> None:
+    """
+    Sets the embedding cache size and, optionally, the folder where caches are persisted.
+    Applies to models loaded after the call.
+    """
+    with _lock:
+        _cache_settings['max_entries'] = max_entries
+        _cache_settings['cache_folder'] = cache_folder
+
+
+def _cache_path(model_name: str) -> str | None:
+    if not _cache_settings['cache_folder']:
+        return None
+    return os.path.join(_cache_settings['cache_folder'], f"{model_name.replace('/', '_')}_embeddings.pkl")
+
+
+def acquire_model(model_name: str = DEFAULT_EMBEDDING_MODEL) -> CachedEncoder:
+    """
+    Returns the shared (cached) SentenceTransformer for `model_name`, loading it on first use.
+
+    Every call increments the model reference count and must be paired with `release_model` once the caller
+    no longer needs it.
+    """
+    with _lock:
+        if model_name not in _models:
+            logger.info(f"Agent-Module: [key='EmbeddingModels'] | Loading embedding model {model_name}")
+            _models[model_name] = CachedEncoder(SentenceTransformer(model_name),
+                                                max_entries=_cache_settings['max_entries'],
+                                                cache_path=_cache_path(model_name))
+            _references[model_name] = 0
+
+        _references[model_name] += 1
+        return _models[model_name]
+
+
+def register_model(model_name: str, model) -> CachedEncoder:
+    """
+    Registers an already built encoder (anything with `encode` and `get_sentence_embedding_dimension`, e.g. a stub
+    encoder for benchmarks) under `model_name`. The registry holds one reference, so the encoder stays loaded until
+    the matching `release_model` call.
+    """
+    with _lock:
+        _models[model_name] = CachedEncoder(model, max_entries=_cache_settings['max_entries'])
+        _references[model_name] = _references.get(model_name, 0) + 1
+        return _models[model_name]
+
+
+def release_model(model_name: str = DEFAULT_EMBEDDING_MODEL) -> None:
+    """
+    Drops one reference to the shared model. The model is unloaded from the registry (and its cache persisted, if
+    configured) when no reference is left.
+    """
+    with _lock:
+        if model_name not in _references:
+            return
+
+        _references[model_name] -= 1
+        if _references[model_name] <= 0:
+            logger.info(f"Agent-Module: [key='EmbeddingModels'] | Unloading embedding model {model_name}")
+            _models[model_name].save()
+            del _models[model_name]
+            del _references[model_name]
+
+
+def save_caches() -> None:
+    """Persists the embedding cache of every loaded model (if configured) without unloading the models."""
+    with _lock:
+        models = list(_models.values())
+    for model in models:
+        model.save()
+
+
+def loaded_models() -> dict[str, int]:
+    """Returns the currently loaded model names with their reference count."""
+    with _lock:
+        return dict(_references)
+
+
+def cache_stats() -> dict[str, dict]:
+    """Returns the embedding cache counters of every loaded model."""
+    with _lock:
+        models = dict(_models)
+    return {model_name: model.cache_info() for model_name, model in models.items()}